@@ -1,44 +1,100 @@
+import time
+_import_start = time.perf_counter()
+
+import functools
+import os
+import threading
+from collections import namedtuple
+
 import dash
 from dash import dcc, html, dash_table
 from dash.dependencies import Input, Output
 from dash.dash_table.Format import Format, Scheme
-import plotly.express as px
 from urllib.parse import quote as url_quote
+import numpy as np
 import pandas as pd
 
 # Import static data
-from static_data import color_mapping, color_columns, damage_columns, table_columns, unique_categories
-from sunburst import create_sunburst_chart, load_sunburst_data
+from static_data import (color_mapping, color_columns, damage_columns, table_columns, unique_categories,
+                         settings_columns, feature_families, drill_holes_column, non_fitting_columns, cut_forms_columns, pearl_columns)
+from sunburst import build_sunburst_index, create_sunburst_chart, load_sunburst_data
+from data_cache import DATA_DIR, data_version
+from excel_loader import WORKBOOKS, format_load_stats, load_workbooks
+from dtype_plan import apply_dtype_plan, flag_mask, frame_memory, memory_report
+from table_query import filter_frame, page_records, sort_frame
+from color_matrix import bit_counts, build_color_matrix, color_counts, query_colors
+from damage_index import MATCH_ALL, MATCH_ANY, build_damage_index, damage_presence, query_damage
+from text_search import build_search_index, parse_query, search_results
+from object_media import build_media_links, build_restoration_links, link_counts, links_of
+from feature_matrix import build_feature_matrix, family_features, feature_counts, query_features, select, split_feature
+from snapshot import SnapshotManager
+from metrics import CallbackMetrics
+from clientside_callbacks import register_clientside_callbacks
+from http_cache import StaticDataServer, init_compression
+
+import_seconds = time.perf_counter() - _import_start
 
 
 columns = [{"name": col, "id": col} for col in table_columns]
 columns.append({"name": "FileName_paths", "id": "FileName_paths", "presentation": "markdown"})
 
+sunburst_table_columns = ['ObjectID', 'ObjectNumber', 'ObjectName', 'DateBegin', 'DateEnd', 'Medium', 'Description', 'Notes']
 
-# Initialize the Dash app
-app = dash.Dash(__name__, suppress_callback_exceptions=True)
-server = app.server  # Expose the Flask server
+search_table_columns = ['ObjectID', 'ObjectNumber', 'ObjectName', 'Bestandteil', 'Score', 'Match']
+# Most search results listed for one query
+SEARCH_LIMIT = 500
+
+# Most bars shown in the cross-filter chart
+CROSS_FILTER_BARS = 40
+
+
+Tables = namedtuple('Tables', [
+    'objects_df', 'userfields_df', 'restaurierung_1_df', 'restaurierung_2_df', 'paths_df', 'text_entries_df'
+])
+
+# Workbooks read by load_data, in the order it returns them
+DATA_FILES = [os.path.join(DATA_DIR, WORKBOOKS[name]) for name in Tables._fields]
+
+# LoadStats of each workbook in the last load_data call
+load_timings = {}
+# Bytes of each frame before and after the dtype plan, from the last load_data call
+memory_usage = {}
 
 def load_data():
-    """Load data from Excel files."""
-    objects_df = pd.read_excel('data/CROWN_Objects_1_2024_02_02.xlsx')
-    userfields_df = pd.read_excel('data/crown-userfields.xlsx')
-    restaurierung_1_df = pd.read_excel('data/CROWN_Restaurierung_1_2024_02_02.xlsx')
-    restaurierung_2_df = pd.read_excel('data/CROWN_Restaurierung_2_2024_02_02.xlsx')
-    paths_df = pd.read_excel('data/CROWN_Restaurierung_3_Medien_2024_02_02.xlsx')
-    return objects_df, userfields_df, restaurierung_1_df, restaurierung_2_df, paths_df
-
-def preprocess_data(objects_df, userfields_df, restaurierung_1_df, restaurierung_2_df, paths_df):
-    """Preprocess data for use in the dashboard."""
+    """Load the columns the dashboard uses from the Excel files (see excel_loader.py) and apply the dtype plan."""
+    frames = []
+    for name, (df, stats) in load_workbooks(dict(zip(Tables._fields, DATA_FILES))).items():
+        before = frame_memory(df)
+        df = apply_dtype_plan(name, df)
+        memory_usage[name] = (before, frame_memory(df))
+        frames.append(df)
+        load_timings[name] = stats
+    objects_df, userfields_df, restaurierung_1_df, restaurierung_2_df, paths_df, text_entries_df = frames
+    return objects_df, userfields_df, restaurierung_1_df, restaurierung_2_df, paths_df, text_entries_df
+
+def split_medium_types(objects_df):
+    """The medium tokens (Medium split at ';') of every object, one per row, indexed like objects_df."""
     def process_medium_types(medium_string):
         if pd.isna(medium_string):
             return []
         return [m.strip() for m in medium_string.split(';') if m.strip()]
 
-    medium_types = objects_df['Medium'].apply(process_medium_types).explode()
+    # Medium is a categorical; split each distinct value once
+    medium = objects_df['Medium'].astype(object)
+    medium_tokens_by_value = {value: process_medium_types(value) for value in medium.dropna().unique()}
+    return medium.map(medium_tokens_by_value).explode()
+
+def preprocess_home(tables, version):
+    """Medium counts and the medium token index of the home page."""
+    objects_df = tables.objects_df
+    medium_types = split_medium_types(objects_df)
     medium_counts = medium_types.value_counts().reset_index()
     medium_counts.columns = ['Medium_Type', 'Count']
 
+    # Posting lists: exact medium token -> ObjectIDs, in table order
+    medium_tokens = pd.DataFrame({'ObjectID': objects_df['ObjectID'], 'Medium_Type': medium_types}).dropna()
+    medium_index = {token: ids.unique() for token, ids in medium_tokens.groupby('Medium_Type', sort=False)['ObjectID']}
+
     unique_mediums = medium_counts['Medium_Type'].unique()
     unique_categories = {um.strip().lower(): um.strip().capitalize() for um in unique_mediums}
 
@@ -51,62 +107,103 @@ def preprocess_data(objects_df, userfields_df, restaurierung_1_df, restaurierung
         return '; '.join(categorized_list)
 
     medium_counts['Category'] = medium_counts['Medium_Type'].apply(categorize_medium)
+    return {'medium_counts': medium_counts, 'medium_index': medium_index}
 
-    color_data = userfields_df[color_columns]
-    color_counts_presence = color_data.apply(lambda col: col.isin([1, '1', 1.0, '1.0']).sum()).reset_index()
-    color_counts_presence.columns = ['Enamel Color', 'Count']
+def preprocess_colors(tables, version):
+    """Colour matrix and colour counts of the enamel colour page."""
+    # Normalise the mixed 1/'1'/1.0/'1.0' colour flags once into a bit-packed matrix
+    color_matrix = build_color_matrix(tables.userfields_df, color_columns)
+    color_counts_presence = pd.DataFrame({'Enamel Color': color_matrix.columns, 'Count': color_counts(color_matrix)})
     color_counts_presence = color_counts_presence[color_counts_presence['Count'] > 0]
     color_counts_presence = color_counts_presence.sort_values(by='Count', ascending=False)
+    return {
+        'color_matrix': color_matrix,
+        'color_counts_presence': color_counts_presence,
+        'color_figure': create_color_figure(color_counts_presence)
+    }
+
+def create_color_figure(color_counts_presence):
+    """The enamel colour bar chart, as a figure dict."""
+    import plotly.express as px
+
+    fig = px.bar(color_counts_presence,
+                 x='Enamel Color',
+                 y='Count',
+                 labels={'Enamel Color': 'Enamel Color', 'Count': 'Frequency'},
+                 title='Distribution of Enamel Colors',
+                 color=color_counts_presence['Enamel Color'],
+                 color_discrete_map=color_mapping)
+    fig.update_layout(
+        xaxis_tickangle=-45,
+        xaxis_title='Enamel Color',
+        yaxis_title='Count',
+        height=600
+    )
+    return fig.to_dict()
 
-    merged_data = pd.merge(objects_df, userfields_df, left_on='ObjectID', right_on='ID', how='inner')
-    relevant_columns_with_bestandteil = damage_columns + ['Bestandteil']
-    filtered_data_with_bestandteil = merged_data[relevant_columns_with_bestandteil]
+def preprocess_damage(tables, version):
+    """Damage counts per component and the damage index of the damage page."""
+    merged_data = pd.merge(tables.objects_df, tables.userfields_df, left_on='ObjectID', right_on='ID', how='inner')
 
-    # Use include_groups=False to silence the deprecation warning
-    damage_counts_by_bestandteil = filtered_data_with_bestandteil.groupby('Bestandteil', group_keys=False).apply(
-        lambda df: df.loc[:, df.columns != 'Bestandteil'].notna().sum()
-    ).reset_index()
+    # A flag recorded as 0 is no damage; see damage_index.damage_presence
+    damage_counts_by_bestandteil = damage_presence(merged_data, damage_columns).groupby(
+        merged_data['Bestandteil']
+    ).sum().reset_index()
 
     damage_counts_by_bestandteil.columns = ['Bestandteil'] + damage_counts_by_bestandteil.columns[1:].tolist()
     filtered_damage_counts = damage_counts_by_bestandteil.loc[
         ~(damage_counts_by_bestandteil.drop(columns=['Bestandteil']) == 0).all(axis=1)
     ]
-
-    # Ensure unique column names before merging
-    restaurierung_2_df = restaurierung_2_df.add_suffix('_rest2')
-    paths_df = paths_df.add_suffix('_paths')
-    restaurierung_1_df = restaurierung_1_df.add_suffix('_rest1')
-    
-    # Merge paths with objects step by step
-    merged_df1 = pd.merge(restaurierung_2_df, paths_df[['CondLineItemID_paths', 'FileName_paths']], left_on='CondLineItemID_rest2', right_on='CondLineItemID_paths', how='left')
-    merged_df2 = pd.merge(restaurierung_1_df, merged_df1, left_on='ConditionID_rest1', right_on='ConditionID_rest2', how='left')
-    merged_with_paths = pd.merge(objects_df, merged_df2, left_on='ObjectID', right_on='ID_rest1', how='left')
-    
-    # Handle duplicated ObjectNumber columns
-    if 'ObjectNumber_rest1' in merged_with_paths.columns and 'ObjectNumber' in merged_with_paths.columns:
-        merged_with_paths['ObjectNumber'] = merged_with_paths['ObjectNumber'].combine_first(merged_with_paths['ObjectNumber_rest1'])
-        merged_with_paths = merged_with_paths.drop(columns=['ObjectNumber_rest1'])
-    
-    # Check columns after merge to ensure 'FileName_paths' is included
-    if 'FileName_paths' not in merged_with_paths.columns:
-        print("FileName column is missing after merge. Available columns:", merged_with_paths.columns)
-    else:
-        print("FileName column successfully merged.")
-    
- # Calculate total gemstones and sapphires
+    damage_index = build_damage_index(merged_data, damage_columns)
+    return {
+        'filtered_damage_counts': filtered_damage_counts,
+        'damage_index': damage_index,
+        'damage_figure': create_damage_figure(filtered_damage_counts)
+    }
+
+def create_damage_figure(filtered_damage_counts):
+    """The stacked damage bar chart, as a figure dict; each damage condition is one trace."""
+    import plotly.express as px
+
+    fig = px.bar(
+        filtered_damage_counts,
+        x='Bestandteil',
+        y=filtered_damage_counts.columns[1:],
+        title='Damage Conditions by Component',
+        labels={'value': 'Count', 'variable': 'Damage Condition'}
+    )
+    fig.update_layout(barmode='stack', xaxis_tickangle=-45)
+    return fig.to_dict()
+
+def preprocess_objects(tables, version):
+    """The drill-down object table shared by every page, with the restoration records and media of each object."""
+    objects_df = tables.objects_df
+    object_ids = objects_df['ObjectID'].to_numpy()
+    restoration_links = build_restoration_links(object_ids, tables.restaurierung_1_df)
+    media_links = build_media_links(object_ids, tables.restaurierung_1_df, tables.restaurierung_2_df, tables.paths_df)
+    object_table, object_row_positions = build_object_table(objects_df, tables.restaurierung_1_df, restoration_links, media_links)
+    return {'object_table': object_table, 'object_row_positions': object_row_positions,
+            'restoration_links': restoration_links, 'media_links': media_links}
+
+def preprocess_pearls(tables, version):
+    """Gemstone counts, cut forms and pearl data of the pearls and gemstones page."""
+    objects_df, userfields_df = tables.objects_df, tables.userfields_df
+
+    # Calculate total gemstones and sapphires
     total_gemstones = objects_df[objects_df['Medium'].str.contains('Edelstein', case=False, na=False)]['ObjectID'].nunique()
     total_sapphires = objects_df[objects_df['Medium'].str.contains('Saphir', case=False, na=False)]['ObjectID'].nunique()
 
     # Filter objects related to Plate A
-    plate_a_objects = objects_df[objects_df['SortNumber'].str.contains('A', case=False, na=False) & objects_df['Medium'].str.contains('Saphir', case=False, na=False)]
+    # The 2024-02-02 export has no SortNumber column; treat that as no Plate A matches
+    sort_numbers = objects_df['SortNumber'] if 'SortNumber' in objects_df.columns else pd.Series('', index=objects_df.index)
+    plate_a_objects = objects_df[sort_numbers.str.contains('A', case=False, na=False) & objects_df['Medium'].str.contains('Saphir', case=False, na=False)]
     plate_a_ids = plate_a_objects['ObjectID'].unique()
     plate_a_userfields = userfields_df[userfields_df['ID'].isin(plate_a_ids)]
 
     # Count drill holes in sapphires on Plate A
-    drill_holes_count = plate_a_userfields['Bohrloch: Anzahl'].dropna().astype(int).sum()
+    drill_holes_count = plate_a_userfields[drill_holes_column].dropna().astype(int).sum()
 
     # Non-Fitting Gemstones on Plate A
-    non_fitting_columns = ['Form: Sonstiges', 'Form: Stein in Fassung', 'Form für Fassung']
     non_fitting_columns_present = [col for col in non_fitting_columns if col in userfields_df.columns]
     if non_fitting_columns_present:
         non_fitting_gemstones = plate_a_userfields[
@@ -119,7 +216,6 @@ def preprocess_data(objects_df, userfields_df, restaurierung_1_df, restaurierung
         non_fitting_count = 0
 
     # Cut Forms of Gemstones on Plate A
-    cut_forms_columns = ['Form: Schliff', 'Form: Schliff: Beschreibung']
     cut_forms_columns_present = [col for col in cut_forms_columns if col in userfields_df.columns]
     if cut_forms_columns_present:
         cut_forms = plate_a_userfields[cut_forms_columns_present].dropna(how='all')
@@ -127,65 +223,364 @@ def preprocess_data(objects_df, userfields_df, restaurierung_1_df, restaurierung
         cut_forms = pd.DataFrame()
 
     # Pearl shapes and characteristics
-    pearl_columns = ['Form', 'Form: Sonstiges', 'Oberfläche', 'Perlmutterstruktur: Beschreibung', 'fehlende Teile', 'fehlende Teile: Beschreibung', 'Kratzer', 'Kratzer: Beschreibung', 'Riss', 'Riss: Beschreibung']
     pearl_columns_present = [col for col in pearl_columns if col in userfields_df.columns]
     if pearl_columns_present:
         pearl_data = userfields_df[pearl_columns_present].dropna(how='all')
     else:
         pearl_data = pd.DataFrame()
 
-    return medium_counts, color_counts_presence, color_columns, filtered_damage_counts, merged_with_paths, total_gemstones, total_sapphires, drill_holes_count, non_fitting_count, cut_forms, pearl_data
-
-
-def get_related_objects_by_ids(objects_df, related_ids):
-    """Filter objects_df based on related IDs and format for DataTable."""
-    related_objects = objects_df[objects_df['ObjectID'].isin(related_ids)]
-    related_objects = related_objects.drop(columns=['SortNumber', 'Authority50ID', 'DateRemarks', 'DimensionRemarks'], errors='ignore')
+    return {
+        'total_gemstones': total_gemstones,
+        'total_sapphires': total_sapphires,
+        'drill_holes_count': drill_holes_count,
+        'non_fitting_count': non_fitting_count,
+        'cut_forms': cut_forms,
+        'pearl_data': pearl_data
+    }
+
+def preprocess_sunburst(tables, version):
+    """Node index and base figure of the sunburst page."""
+    return {
+        'sunburst_index': freeze_index(build_sunburst_index(tables.userfields_df)),
+        'sunburst_figure': create_sunburst_chart(load_sunburst_data(tables.userfields_df)).to_dict()
+    }
+
+def preprocess_search(tables, version):
+    """BM25 index over the object texts of the search page."""
+    return {'search_index': build_search_index(
+        tables.objects_df, tables.text_entries_df, tables.restaurierung_1_df, tables.restaurierung_2_df
+    )}
+
+def preprocess_features(tables, version):
+    """Object × feature matrix of the cross-filter page."""
+    objects_df, userfields_df = tables.objects_df, tables.userfields_df
+    ids = userfields_df['ID'].to_numpy()
+
+    medium_tokens = pd.DataFrame({'ObjectID': objects_df['ObjectID'], 'Medium_Type': split_medium_types(objects_df)}).dropna()
+    components = objects_df[['ObjectID', 'Bestandteil']].dropna()
+    colors = flag_mask(userfields_df[color_columns])
+    conditions = [col for col in damage_columns if col.endswith(':') and col in userfields_df.columns]
+    damaged = damage_presence(userfields_df, conditions)
+    settings = {setting: [col for col in setting_columns if col in userfields_df.columns]
+                for setting, setting_columns in settings_columns.items()}
+    families = {
+        'medium': {token: group.to_numpy() for token, group in medium_tokens.groupby('Medium_Type')['ObjectID']},
+        'component': {component: group.to_numpy()
+                      for component, group in components.groupby('Bestandteil', observed=True)['ObjectID']},
+        'colour': {col: ids[colors[:, j]] for j, col in enumerate(color_columns)},
+        # A condition counts when its flag is set, as on the damage page and in the export
+        'damage': {col: ids[damaged[col].to_numpy()] for col in conditions},
+        'setting': {setting: ids[userfields_df[cols].notna().any(axis=1).to_numpy()]
+                    for setting, cols in settings.items() if cols},
+    }
+    return {'feature_matrix': build_feature_matrix(objects_df['ObjectID'].to_numpy(), families)}
+
+# Data products of each page, built on first use
+PAGE_BUILDERS = {
+    'objects': preprocess_objects,
+    'home': preprocess_home,
+    'colors': preprocess_colors,
+    'damage': preprocess_damage,
+    'sunburst': preprocess_sunburst,
+    'pearls': preprocess_pearls,
+    'search': preprocess_search,
+    'features': preprocess_features,
+}
+
+
+def media_file_name(file_path):
+    """The file name of a media FileName, which is a Windows path."""
+    return file_path.split("\\")[-1]
+
+def download_link(file_path):
+    """Format a media FileName as a markdown download link named after the file."""
+    zenodo_base_url = "https://zenodo.org/api/records/12508052/files/"
+    file_name = media_file_name(file_path)
+    # URL encode the filename
+    encoded_file_name = url_quote(file_name)
+    # Create the download URL
+    download_url = f"{zenodo_base_url}{encoded_file_name}/content"
+    return f'[{file_name}]({download_url})'
+
+def add_media_links(snapshot, records):
+    """Replace the FileName_paths cell of object table records with the download links of each object's media.
+
+    Only the records of the requested page are formatted, so the links are
+    never stored in the table; the records are modified in place.
+    """
+    positions = snapshot.object_row_positions.get_indexer([record.get('ObjectID') for record in records])
+    for record, position in zip(records, positions):
+        file_paths = links_of(snapshot.media_links, position) if position >= 0 else ()
+        record['FileName_paths'] = ' '.join(download_link(file_path) for file_path in file_paths)
+    return records
+
+def table_records(snapshot, frame):
+    """The records of a query_table result, with the media links of object tables filled in."""
+    records = frame.to_dict('records')
+    if 'FileName_paths' in frame.columns:
+        add_media_links(snapshot, records)
+    return records
+
+def build_object_table(objects_df, restaurierung_1_df, restoration_links, media_links):
+    """Build the read-only drill-down table, one row per object, and an index of its ObjectIDs.
+
+    The FileName_paths column holds the file names of each object's media,
+    which the table's filter and sorting run on; add_media_links turns them
+    into download links per page. Callbacks only slice the table through
+    get_object_rows and never modify it, as it is shared by every request
+    thread.
+    """
+    object_table = objects_df.reset_index(drop=True).reindex(columns=table_columns)
+    object_table['FileName_paths'] = [', '.join(media_file_name(file_path) for file_path in links_of(media_links, position))
+                                      for position in range(len(object_table))]
+
+    # Objects without an ObjectNumber take the one of their first restoration record
+    if 'ObjectNumber' in restaurierung_1_df.columns:
+        missing = np.flatnonzero(object_table['ObjectNumber'].isna().to_numpy() & (link_counts(restoration_links) > 0))
+        if len(missing):
+            first_records = restoration_links.values[restoration_links.offsets[missing]]
+            object_table.loc[missing, 'ObjectNumber'] = restaurierung_1_df['ObjectNumber'].to_numpy()[first_records]
+
+    object_row_positions = pd.Index(object_table['ObjectID'])
+    return object_table, object_row_positions
+
+def get_object_rows(snapshot, object_ids, columns=None):
+    """Slice the snapshot's object table to the rows of the given objects, in table order."""
+    positions = snapshot.object_row_positions.get_indexer(np.asarray(object_ids))
+    rows = np.sort(positions[positions >= 0])
+    if columns is not None:
+        return snapshot.object_table.iloc[rows, [snapshot.object_table.columns.get_loc(col) for col in columns]]
+    return snapshot.object_table.iloc[rows]
+
+def freeze_index(index):
+    """Store the ID sets of an index as sorted numpy arrays.
+
+    Numpy arrays hold the IDs in one buffer instead of one Python object per
+    ID, so reading them in a forked worker does not copy shared pages.
+    """
+    return {key: np.array(sorted(ids)) for key, ids in index.items()}
+
+class DataSnapshot:
+    """Everything the callbacks read, for one version of the workbooks.
+
+    Each page's data products are built by its PAGE_BUILDERS entry the first
+    time one of them is read, then kept; product_timings records how long
+    each page took. A snapshot is never modified otherwise: hot reload
+    replaces it as a whole. The query results and figures computed from a
+    snapshot are cached on it, so they go away together with it.
+    """
+
+    def __init__(self, version, tables):
+        self.version = version
+        self.tables = tables
+        self.product_timings = {}
+        self._products = {}
+        self._locks = {page: threading.Lock() for page in PAGE_BUILDERS}
+        self.query_cache = functools.lru_cache(maxsize=64)(functools.partial(run_table_query, self))
+        self.figure_cache = functools.lru_cache(maxsize=32)(functools.partial(build_medium_figure, self))
+
+    def products(self, page):
+        """Return the data products of a page, building them on first use."""
+        products = self._products.get(page)
+        if products is None:
+            with self._locks[page]:
+                products = self._products.get(page)
+                if products is None:
+                    start = time.perf_counter()
+                    products = PAGE_BUILDERS[page](self.tables, self.version)
+                    self.product_timings[page] = time.perf_counter() - start
+                    self._products[page] = products
+        return products
+
+    def warm(self):
+        """Build the data products of every page."""
+        for page in PAGE_BUILDERS:
+            self.products(page)
+        return self
+
+    def __getattr__(self, name):
+        page = PRODUCT_PAGES.get(name)
+        if page is None:
+            raise AttributeError(name)
+        return self.products(page)[name]
+
+    def __hash__(self):
+        return hash(self.version)
+
+    def __eq__(self, other):
+        return isinstance(other, DataSnapshot) and self.version == other.version
+
+# Which page builds each product
+PRODUCT_PAGES = {
+    'object_table': 'objects', 'object_row_positions': 'objects',
+    'restoration_links': 'objects', 'media_links': 'objects',
+    'medium_counts': 'home', 'medium_index': 'home',
+    'color_matrix': 'colors', 'color_counts_presence': 'colors', 'color_figure': 'colors',
+    'filtered_damage_counts': 'damage', 'damage_index': 'damage', 'damage_figure': 'damage',
+    'sunburst_index': 'sunburst', 'sunburst_figure': 'sunburst',
+    'total_gemstones': 'pearls', 'total_sapphires': 'pearls', 'drill_holes_count': 'pearls',
+    'non_fitting_count': 'pearls', 'cut_forms': 'pearls', 'pearl_data': 'pearls',
+    'search_index': 'search',
+    'feature_matrix': 'features',
+}
+
+def build_snapshot(tables=None, version=None):
+    """Load the workbooks into a new DataSnapshot; page data is built lazily.
+
+    tables defaults to load_data(); pass a load_data-style tuple together with
+    a version to build a snapshot from frames already in memory.
+    """
+    if tables is None:
+        version = data_version(DATA_FILES)
+        tables = load_data()
+    return DataSnapshot(version, Tables(*tables))
+
+def get_selection_rows(snapshot, table_id, selection):
+    """Return the full result frame behind an object table for a chart selection."""
+    if selection is None:
+        return pd.DataFrame()
+    if table_id == 'object-table':
+        return get_object_rows(snapshot, snapshot.medium_index.get(selection, []))
+    if table_id == 'color-object-table':
+        return get_object_rows(snapshot, query_colors(snapshot.color_matrix, **dict(selection)))
+    if table_id == 'damage-object-table':
+        return get_object_rows(snapshot, query_damage(snapshot.damage_index, **dict(selection)))
+    if table_id == 'sunburst-table':
+        return get_object_rows(snapshot, snapshot.sunburst_index.get(selection, []), sunburst_table_columns)
+    if table_id == 'search-table':
+        return search_results(snapshot.search_index, selection, SEARCH_LIMIT)
+    if table_id == 'cross-filter-table':
+        return get_object_rows(snapshot, query_features(snapshot.feature_matrix, **dict(selection)))
+    raise ValueError(f"Unknown table: {table_id}")
+
+def hashable_selection(selection):
+    """Turn a selection as stored in the browser (JSON) into a hashable key for the result cache."""
+    if isinstance(selection, dict):
+        return tuple(
+            (key, tuple(value) if isinstance(value, list) else value)
+            for key, value in sorted(selection.items())
+        )
+    return selection
+
+def query_table(snapshot, table_id, selection, filter_query='', sort_key=()):
+    """Return the filtered and sorted result frame of a table, cached per query.
+
+    The unfiltered result of a selection is cached as well, so paging, sorting
+    and filtering never resolve the selection again. Callers must not mutate
+    the returned frame. The cache belongs to the snapshot: a request still
+    working on a replaced snapshot cannot put its results into the cache of
+    the new one, and a reload needs no cache clearing.
+    """
+    return snapshot.query_cache(table_id, selection, filter_query, sort_key)
+
+def run_table_query(snapshot, table_id, selection, filter_query, sort_key):
+    if filter_query or sort_key:
+        result = query_table(snapshot, table_id, selection)
+        sort_by = [{'column_id': column_id, 'direction': direction} for column_id, direction in sort_key]
+        return sort_frame(filter_frame(result, filter_query), sort_by)
+    return get_selection_rows(snapshot, table_id, selection)
+
+def medium_figure(snapshot, selected_categories):
+    """The home page bar chart for a selection of medium categories, as a figure dict cached per snapshot."""
+    return snapshot.figure_cache(selected_categories)
+
+def build_medium_figure(snapshot, selected_categories):
+    import plotly.express as px
+
+    filtered_data = snapshot.medium_counts[snapshot.medium_counts['Category'].isin(selected_categories)]
+
+    if filtered_data.empty:
+        return px.bar(title='No data available for selected categories').to_dict()
+
+    fig = px.bar(filtered_data, 
+                 x='Medium_Type', 
+                 y='Count', 
+                 color='Category',
+                 labels={'Medium_Type': 'Object Type', 'Count': 'Frequency'},
+                 title='Object Medium Distribution',
+                 hover_data=['Medium_Type', 'Count', 'Category'])
+
+    fig.update_layout(
+        xaxis_tickangle=-45,
+        xaxis_title='',
+        yaxis_title='Frequency',
+        legend_title='Object Category',
+        height=600
+    )
 
-    # Check if 'FileName_paths' is present before attempting to use it
-    if 'FileName_paths' not in related_objects.columns:
-        print("FileName column is missing. Available columns:", related_objects.columns)
-        return related_objects[table_columns + ['ObjectNumber']].to_dict('records')
-    else:
-        # Apply the hyperlink formatting
-        related_objects = format_filename_as_link(related_objects)
-        return related_objects[table_columns + ['ObjectNumber', 'FileName_paths']].to_dict('records')
+    fig.update_layout(
+        updatemenus=[
+            dict(
+                type="buttons",
+                direction="right",
+                x=0.7,
+                y=1.2,
+                showactive=True,
+                buttons=[
+                    dict(label="Linear Scale",
+                         method="relayout",
+                         args=[{"yaxis.type": "linear"}]),
+                    dict(label="Log Scale",
+                         method="relayout",
+                         args=[{"yaxis.type": "log"}])
+                ]
+            )
+        ]
+    )
+    return fig.to_dict()
 
-# Load and preprocess data
-objects_df, userfields_df, restaurierung_1_df, restaurierung_2_df, paths_df = load_data()
-medium_counts, color_counts_presence, color_columns, filtered_damage_counts, merged_with_paths, total_gemstones, total_sapphires, drill_holes_count, non_fitting_count, cut_forms, pearl_data = preprocess_data(objects_df, userfields_df, restaurierung_1_df, restaurierung_2_df, paths_df)
+snapshots = SnapshotManager(
+    build_snapshot,
+    os.path.join(DATA_DIR, '*.xlsx'),
+    interval=int(os.environ.get('DATA_RELOAD_INTERVAL', 30)),
+    prepare=DataSnapshot.warm
+)
 
 # Layout Definitions
 
-def format_filename_as_link(df):
-    """Format the FileName_paths column as clickable download links."""
-    zenodo_base_url = "https://zenodo.org/api/records/12508052/files/"
-    
-    def create_download_link(file_path):
-        # Extract the filename from the full path
-        file_name = file_path.split("\\")[-1]
-        # URL encode the filename
-        encoded_file_name = url_quote(file_name)
-        # Create the download URL
-        download_url = f"{zenodo_base_url}{encoded_file_name}/content"
-        return f'[Download]({download_url})'
-    
-    df['FileName_paths'] = df['FileName_paths'].apply(
-        lambda x: create_download_link(x) if pd.notna(x) else ""
-    )
-    return df
-
 # Define the navigation bar
 nav_bar = html.Div([
     dcc.Link('Home', href='/', className='nav-link'),
     dcc.Link('Enamel Color Distribution', href='/colors', className='nav-link'),
     dcc.Link('Enamel Damage Distribution', href='/damage', className='nav-link'),
     dcc.Link('Sunburst Chart', href='/sunburst', className='nav-link'),
-    dcc.Link('Pearls and Gem Stones', href='/pearls-gemstones', className='nav-link')
+    dcc.Link('Pearls and Gem Stones', href='/pearls-gemstones', className='nav-link'),
+    dcc.Link('Text Search', href='/search', className='nav-link'),
+    dcc.Link('Cross Filter', href='/cross-filter', className='nav-link')
 ], className='nav-bar')
 
+def create_object_table(table_id, table_columns):
+    """Create a DataTable that pages, sorts and filters on the server."""
+    return html.Div([
+        dcc.Store(id=f'{table_id}-selection'),
+        dash_table.DataTable(
+            id=table_id,
+            columns=table_columns,
+            page_current=0,
+            page_size=20,
+            page_action='custom',
+            sort_action='custom',
+            sort_mode='multi',
+            sort_by=[],
+            filter_action='custom',
+            filter_query='',
+            style_table={'overflowX': 'auto'},
+            style_header={
+                'backgroundColor': 'rgb(230, 230, 230)',
+                'fontWeight': 'bold'
+            },
+            style_cell={
+                'textAlign': 'left',
+                'minWidth': '0px', 'maxWidth': '180px',
+                'whiteSpace': 'normal'
+            }
+        ),
+        html.Div(id=f'{table_id}-row-count')
+    ])
+
 # Home
 def create_home_page_layout():
+    snapshot = snapshots.current()
     return html.Div([
         nav_bar,
         html.H1("CROWN Data Dashboard (~95% AI generated)"),
@@ -193,8 +588,8 @@ def create_home_page_layout():
             html.Label("Select Object via Medium"),
             dcc.Dropdown(
                 id='category-dropdown',
-                options=[{'label': cat, 'value': cat} for cat in medium_counts['Category'].unique()],
-                value=medium_counts['Category'].unique().tolist(),
+                options=[{'label': cat, 'value': cat} for cat in snapshot.medium_counts['Category'].unique()],
+                value=snapshot.medium_counts['Category'].unique().tolist(),
                 multi=True
             ),
         ]),
@@ -205,124 +600,93 @@ def create_home_page_layout():
 
         html.Div(id='click-data', style={'display': 'none'}),
 
-        dash_table.DataTable(
-            id='object-table',
-            columns=columns,
-            page_size=20,
-            sort_action='native',
-            filter_action='native',
-            style_table={'overflowX': 'auto'},
-             style_header={
-                'backgroundColor': 'rgb(230, 230, 230)',
-                'fontWeight': 'bold'
-            },
-            style_cell={
-                'textAlign': 'left',
-                'minWidth': '0px', 'maxWidth': '180px',
-                'whiteSpace': 'normal'
-            }
-        )
+        create_object_table('object-table', columns)
     ])
 
 # Enamel Damage Distribution
 def create_damage_distribution_layout():
+    snapshot = snapshots.current()
+    component_options = [{'label': component, 'value': component} for component in snapshot.filtered_damage_counts['Bestandteil']]
+    condition_options = [{'label': condition, 'value': condition} for condition in snapshot.filtered_damage_counts.columns[1:]]
     return html.Div([
         nav_bar,
         html.H1("Enamel Damage Distribution"),
-        dcc.Graph(id='damage-distribution-chart'),
+        dcc.Graph(id='damage-distribution-chart', figure=snapshot.damage_figure),
         html.Div(id='click-data-damage', style={'display': 'none'}),
-        dash_table.DataTable(
-            id='damage-object-table',
-            columns=columns,
-            page_size=20,
-            sort_action='native',
-            filter_action='native',
-            style_table={'overflowX': 'auto'},
-            style_header={
-                'backgroundColor': 'rgb(230, 230, 230)',
-                'fontWeight': 'bold'
-            },
-            style_cell={
-                'textAlign': 'left',
-                'minWidth': '0px', 'maxWidth': '180px',
-                'whiteSpace': 'normal'
-            }
-        )
+        html.Div([
+            html.Label("Components"),
+            dcc.Dropdown(id='damage-components', options=component_options, value=[], multi=True),
+            html.Label("Damage conditions"),
+            dcc.Dropdown(id='damage-conditions', options=condition_options, value=[], multi=True),
+            dcc.RadioItems(
+                id='damage-match',
+                options=[
+                    {'label': 'Objects showing all selected conditions', 'value': MATCH_ALL},
+                    {'label': 'Objects showing any selected condition', 'value': MATCH_ANY}
+                ],
+                value=MATCH_ALL
+            ),
+        ]),
+        html.Div(id='damage-query-summary'),
+        create_object_table('damage-object-table', columns)
     ])
 
 # Enamel Color Distribution
 def create_color_distribution_layout():
+    snapshot = snapshots.current()
+    color_options = [{'label': unique_categories.get(col, col), 'value': col} for col in snapshot.color_matrix.columns]
     return html.Div([
         nav_bar,
         html.H1("Enamel Color Distribution"),
-        dcc.Graph(id='enamel-colors-chart'),
+        dcc.Graph(id='enamel-colors-chart', figure=snapshot.color_figure),
         html.Div(id='click-data-color', style={'display': 'none'}),
-        dash_table.DataTable(
-            id='color-object-table',
-            columns=columns,
-            page_size=20,
-            sort_action='native',
-            filter_action='native',
-            style_table={'overflowX': 'auto'},
-            style_header={
-                'backgroundColor': 'rgb(230, 230, 230)',
-                'fontWeight': 'bold'
-            },
-            style_cell={
-                'textAlign': 'left',
-                'minWidth': '0px', 'maxWidth': '180px',
-                'whiteSpace': 'normal'
-            }
-        )
+        html.Div([
+            html.Label("Objects with all of these colours"),
+            dcc.Dropdown(id='color-all-of', options=color_options, value=[], multi=True),
+            html.Label("and at least one of these colours"),
+            dcc.Dropdown(id='color-any-of', options=color_options, value=[], multi=True),
+            html.Label("and none of these colours"),
+            dcc.Dropdown(id='color-none-of', options=color_options, value=[], multi=True),
+        ]),
+        html.Div(id='color-query-summary'),
+        create_object_table('color-object-table', columns)
     ])
 
 # Sunburst Layout
 def create_sunburst_layout():
+    snapshot = snapshots.current()
     return html.Div([
         nav_bar,
         html.H1("Settings"),
-        dcc.Graph(id='sunburst-chart'),
-        dash_table.DataTable(
-            id='sunburst-table',
-            columns=[{"name": col, "id": col} for col in ['ObjectID', 'ObjectNumber', 'ObjectName', 'DateBegin', 'DateEnd', 'Medium', 'Description', 'Notes']],
-            page_size=20,
-            sort_action='native',
-            filter_action='native',
-            style_table={'overflowX': 'auto'},
-            style_header={
-                'backgroundColor': 'rgb(230, 230, 230)',
-                'fontWeight': 'bold'
-            },
-            style_cell={
-                'textAlign': 'left',
-                'minWidth': '0px', 'maxWidth': '180px',
-                'whiteSpace': 'normal'
-            }
-        )
+        dcc.Graph(id='sunburst-chart', figure=snapshot.sunburst_figure),
+        create_object_table('sunburst-table', [{"name": col, "id": col} for col in sunburst_table_columns])
     ])
 
 # Pearls and Gem Stones
 def create_pearls_gemstones_layout():
+    import plotly.express as px
+
+    snapshot = snapshots.current()
     return html.Div([
         nav_bar,
         html.H1("Pearls and Gem Stones"),
         html.Div([
             html.H2("Overview"),
-            html.P(f"Total number of gemstones: {total_gemstones}"),
-            html.P(f"Total number of sapphires: {total_sapphires}"),
+            html.P(f"Total number of gemstones: {snapshot.total_gemstones}"),
+            html.P(f"Total number of sapphires: {snapshot.total_sapphires}"),
             html.H2("Drill Holes in Sapphires on Plate A"),
-            html.P(f"Number of sapphires with drill holes: {drill_holes_count}"),
+            html.P(f"Number of sapphires with drill holes: {snapshot.drill_holes_count}"),
             html.H2("Non-Fitting Gemstones on Plate A"),
-            html.P(f"Number of non-fitting gemstones: {non_fitting_count}"),
+            html.P(f"Number of non-fitting gemstones: {snapshot.non_fitting_count}"),
             html.H2("Cut Forms of Gemstones on Plate A"),
             dcc.Graph(
                 id='cut-forms-chart',
-                figure=px.bar(cut_forms, x='Form: Schliff', y=cut_forms.index, title='Cut Forms of Gemstones on Plate A')
+                figure=px.bar(snapshot.cut_forms, x='Form: Schliff', y=snapshot.cut_forms.index, title='Cut Forms of Gemstones on Plate A')
             ),
             html.H2("Pearl Shapes and Characteristics"),
             dash_table.DataTable(
-                data=pearl_data.to_dict('records'),
-                columns=[{"name": col, "id": col} for col in pearl_data.columns],
+                data=snapshot.pearl_data.to_dict('records'),
+                columns=[{"name": col, "id": col} for col in snapshot.pearl_data.columns],
                 page_size=10,
                 style_table={'overflowX': 'auto'},
                 style_header={'backgroundColor': 'rgb(230, 230, 230)', 'fontWeight': 'bold'},
@@ -331,6 +695,90 @@ def create_pearls_gemstones_layout():
         ])
     ])
 
+# Text Search
+def create_search_layout():
+    return html.Div([
+        nav_bar,
+        html.H1("Text Search"),
+        html.P("Searches descriptions, notes, text entries and restoration treatments and statements. "
+               "End a word with * to match every word starting with it."),
+        dcc.Input(id='search-query', type='search', debounce=True, placeholder='e.g. Fehlstellen Email*',
+                  style={'width': '100%'}),
+        html.Div(id='search-summary'),
+        create_object_table('search-table', [{"name": col, "id": col} for col in search_table_columns])
+    ])
+
+# Cross Filter
+def create_cross_filter_layout():
+    return html.Div([
+        nav_bar,
+        html.H1("Cross Filter"),
+        html.P("Lists the objects having every selected feature. Each option shows how many of those objects have it."),
+        html.Div([
+            html.Div([
+                html.Label(label),
+                dcc.Dropdown(id=f'cross-filter-{family}', options=[], value=[], multi=True)
+            ])
+            for family, label in feature_families.items()
+        ]),
+        html.Div(id='cross-filter-summary'),
+        dcc.RadioItems(
+            id='cross-filter-family',
+            options=[{'label': label, 'value': family} for family, label in feature_families.items()],
+            value='colour',
+            inline=True
+        ),
+        dcc.Graph(id='cross-filter-chart'),
+        create_object_table('cross-filter-table', columns)
+    ])
+
+def feature_label(feature):
+    family, value = split_feature(feature)
+    return unique_categories.get(value, value) if family == 'colour' else value
+
+def cross_filter_options(matrix, family, count_by_feature, selected):
+    """Dropdown options of a feature family: the features some matching object has, and the selected ones."""
+    return [
+        {'label': f"{feature_label(feature)} ({count_by_feature[feature]})", 'value': feature}
+        for feature in family_features(matrix, family)
+        if count_by_feature[feature] or feature in selected
+    ]
+
+def cross_filter_figure(matrix, family, count_by_feature, object_count):
+    """Bar chart of how many of the matching objects have each feature of a family, as a figure dict.
+
+    Built as a plain dict: plotly.express would take longer than counting.
+    """
+    bars = sorted(((int(count_by_feature[feature]), feature_label(feature)) for feature in family_features(matrix, family)
+                   if count_by_feature[feature]), reverse=True)[:CROSS_FILTER_BARS]
+    label = feature_families[family]
+    if not bars:
+        return {'data': [], 'layout': {'title': {'text': f'No {label.lower()} recorded for the matching objects'}}}
+    return {
+        'data': [{
+            'type': 'bar',
+            'x': [name for _, name in bars],
+            'y': [count for count, _ in bars],
+            'hovertemplate': f'{label}=%{{x}}<br>Objects=%{{y}}<extra></extra>'
+        }],
+        'layout': {
+            'title': {'text': f"{label} of the {object_count} matching objects"},
+            'xaxis': {'title': {'text': label}, 'tickangle': -45},
+            'yaxis': {'title': {'text': 'Objects'}}
+        }
+    }
+
+# Pathname -> page layout; any other path shows the home page
+PAGE_LAYOUTS = {
+    '/': create_home_page_layout,
+    '/colors': create_color_distribution_layout,
+    '/damage': create_damage_distribution_layout,
+    '/sunburst': create_sunburst_layout,
+    '/pearls-gemstones': create_pearls_gemstones_layout,
+    '/search': create_search_layout,
+    '/cross-filter': create_cross_filter_layout,
+}
+
 # Define Callbacks
 def register_callbacks(app):
     @app.callback(
@@ -338,74 +786,35 @@ def register_callbacks(app):
         [Input('url', 'pathname')]
     )
     def display_page(pathname):
-        if pathname == '/colors':
-            return create_color_distribution_layout()
-        elif pathname == '/damage':
-            return create_damage_distribution_layout()
-        elif pathname == '/sunburst':
-            return create_sunburst_layout()
-        elif pathname == '/pearls-gemstones':
-            return create_pearls_gemstones_layout()
-        else:
-            return create_home_page_layout()
+        return PAGE_LAYOUTS.get(pathname, create_home_page_layout)()
+
+    @app.callback(
+        Output('object-distribution-chart', 'figure'),
+        [Input('category-dropdown', 'value')]
+    )
+    def update_medium_chart(selected_categories):
+        return medium_figure(snapshots.current(), tuple(selected_categories or ()))
 
+    # A click only changes the summary and the table; the chart is outlined in the browser
     @app.callback(
-        [Output('object-distribution-chart', 'figure'),
-         Output('summary-stats', 'children'),
+        [Output('summary-stats', 'children'),
          Output('click-data', 'children'),
-         Output('object-table', 'data')],
+         Output('object-table-selection', 'data'),
+         Output('object-table', 'page_current')],
         [Input('category-dropdown', 'value'),
          Input('object-distribution-chart', 'clickData')]
     )
-    def update_chart_and_summary(selected_categories, click_data):
-        # Update charts based on dropdown selection
-        filtered_data = medium_counts[medium_counts['Category'].isin(selected_categories)]
-        
+    def update_medium_summary(selected_categories, click_data):
+        snapshot = snapshots.current()
+        filtered_data = snapshot.medium_counts[snapshot.medium_counts['Category'].isin(selected_categories)]
+
         if filtered_data.empty:
-            fig = px.bar(title='No data available for selected categories')
             summary = html.Div([
                 html.P("No object types found for the selected categories."),
                 html.P("Please select different categories.")
             ])
             click_message = "No data"
-            table_data = []
-            return fig, summary, click_message, table_data
-        
-        fig = px.bar(filtered_data, 
-                     x='Medium_Type', 
-                     y='Count', 
-                     color='Category',
-                     labels={'Medium_Type': 'Object Type', 'Count': 'Frequency'},
-                     title='Object Medium Distribution',
-                     hover_data=['Medium_Type', 'Count', 'Category'])
-        
-        fig.update_layout(
-            xaxis_tickangle=-45,
-            xaxis_title='',
-            yaxis_title='Frequency',
-            legend_title='Object Category',
-            height=600
-        )
-        
-        fig.update_layout(
-            updatemenus=[
-                dict(
-                    type="buttons",
-                    direction="right",
-                    x=0.7,
-                    y=1.2,
-                    showactive=True,
-                    buttons=[
-                        dict(label="Linear Scale",
-                             method="relayout",
-                             args=[{"yaxis.type": "linear"}]),
-                        dict(label="Log Scale",
-                             method="relayout",
-                             args=[{"yaxis.type": "log"}])
-                    ]
-                )
-            ]
-        )
+            return summary, click_message, None, 0
 
         total_count = filtered_data['Count'].sum()
         most_common = filtered_data.loc[filtered_data['Count'].idxmax(), 'Medium_Type'] if not filtered_data.empty else "N/A"
@@ -418,11 +827,10 @@ def register_callbacks(app):
 
         # Handle click data for additional details
         click_message = "No data"
-        table_data = []
         if click_data:
             clicked_object = click_data['points'][0]['x']
             click_message = f"You clicked on: {clicked_object}"
-            details = medium_counts[medium_counts['Medium_Type'] == clicked_object]
+            details = snapshot.medium_counts[snapshot.medium_counts['Medium_Type'] == clicked_object]
             details_text = html.Div([
                 html.P(f"Details for {clicked_object}:"),
                 html.P(f"Count: {details['Count'].values[0]}"),
@@ -430,121 +838,155 @@ def register_callbacks(app):
             ])
             
             # Populate the table with all related objects
-            related_objects = objects_df[objects_df['Medium'].str.contains(clicked_object, case=False, na=False)]
-            table_data = get_related_objects_by_ids(merged_with_paths, related_objects['ObjectID'])
-            
-            return fig, details_text, click_message, table_data
-        
-        return fig, summary, click_message, table_data
+            return details_text, click_message, clicked_object, 0
+
+        return summary, click_message, None, 0
 
     @app.callback(
-        [Output('enamel-colors-chart', 'figure'),
-         Output('color-object-table', 'data')],
-        [Input('url', 'pathname'),
-         Input('enamel-colors-chart', 'clickData')]
+        [Output('color-object-table-selection', 'data'),
+         Output('color-object-table', 'page_current'),
+         Output('color-query-summary', 'children')],
+        [Input('color-all-of', 'value'),
+         Input('color-any-of', 'value'),
+         Input('color-none-of', 'value')]
     )
-    def update_enamel_colors_chart(pathname, click_data):
-        if pathname == '/colors':
-            fig = px.bar(color_counts_presence, 
-                         x='Enamel Color', 
-                         y='Count', 
-                         labels={'Enamel Color': 'Enamel Color', 'Count': 'Frequency'}, 
-                         title='Distribution of Enamel Colors',
-                         color=color_counts_presence['Enamel Color'],
-                         color_discrete_map=color_mapping)
-            fig.update_layout(
-                xaxis_tickangle=-45,
-                xaxis_title='Enamel Color',
-                yaxis_title='Count',
-                height=600
-            )
-
-            table_data = []
-            if click_data:
-                clicked_color = click_data['points'][0]['x']
-                color_column = next(col for col in color_columns if clicked_color in col)
-                related_ids = userfields_df[userfields_df[color_column].isin([1, '1', 1.0, '1.0'])]['ID']
-                table_data = get_related_objects_by_ids(merged_with_paths, related_ids)
+    def update_color_query(all_of, any_of, none_of):
+        snapshot = snapshots.current()
+        if not (all_of or any_of or none_of):
+            return None, 0, "Click a colour or choose colours above to list objects."
+        selection = {'all_of': sorted(all_of or []), 'any_of': sorted(any_of or []), 'none_of': sorted(none_of or [])}
+        object_count = len(query_colors(snapshot.color_matrix, **selection))
+        return selection, 0, f"{object_count} objects match the colour query."
 
-                if 'FileName_paths' not in merged_with_paths.columns:
-                    print("FileName_paths column is missing in merged_with_paths. Available columns:", merged_with_paths.columns)
+    @app.callback(
+        [Output('damage-object-table-selection', 'data'),
+         Output('damage-object-table', 'page_current'),
+         Output('damage-query-summary', 'children')],
+        [Input('damage-components', 'value'),
+         Input('damage-conditions', 'value'),
+         Input('damage-match', 'value')]
+    )
+    def update_damage_query(components, conditions, match):
+        snapshot = snapshots.current()
+        if not conditions:
+            return None, 0, "Click a bar segment or choose damage conditions above to list objects."
+        selection = {'components': sorted(components or []), 'conditions': sorted(conditions), 'match': match}
+        object_count = len(query_damage(snapshot.damage_index, **selection))
+        return selection, 0, f"{object_count} objects match the damage query."
 
-            return fig, table_data
-        return {}, []
+    @app.callback(
+        [Output('search-table-selection', 'data'),
+         Output('search-table', 'page_current'),
+         Output('search-summary', 'children')],
+        [Input('search-query', 'value')]
+    )
+    def update_search(query):
+        snapshot = snapshots.current()
+        query = ' '.join((query or '').split())
+        if not parse_query(query):
+            return None, 0, "Enter one or more words to search for."
+        # Build the search index first, so its one-off build is not counted in the query time
+        snapshot.products('search')
+        start = time.perf_counter()
+        object_count = len(query_table(snapshot, 'search-table', query))
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        limited = " (best matches only)" if object_count == SEARCH_LIMIT else ""
+        return query, 0, f"{object_count} objects match{limited}, found in {elapsed_ms:.1f} ms."
 
     @app.callback(
-        [Output('sunburst-chart', 'figure'),
-         Output('sunburst-table', 'data')],
-        [Input('sunburst-chart', 'clickData')]
+        [Output('cross-filter-table-selection', 'data'),
+         Output('cross-filter-table', 'page_current'),
+         Output('cross-filter-summary', 'children'),
+         Output('cross-filter-chart', 'figure')]
+        + [Output(f'cross-filter-{family}', 'options') for family in feature_families],
+        [Input(f'cross-filter-{family}', 'value') for family in feature_families]
+        + [Input('cross-filter-family', 'value')]
     )
-    def update_sunburst_chart(click_data):
-        df_sunburst = load_sunburst_data(userfields_df)
-        selected_path = None
-        
-        if click_data:
-            selected_value = click_data['points'][0]['label']
-            selected_path = click_data['points'][0]['id'].split('/')
-            related_objects = userfields_df[userfields_df.apply(lambda row: selected_value in row.values, axis=1)]
-            related_object_ids = related_objects['ID'].unique()
-            filtered_objects = merged_with_paths[merged_with_paths['ObjectID'].isin(related_object_ids)]
-            table_data = filtered_objects.to_dict('records')
-        else:
-            table_data = []
-
-        fig = create_sunburst_chart(df_sunburst, selected_path)
-        return fig, table_data
-
-    # Damage Distribution Chart Callback
+    def update_cross_filter(*values):
+        *selected, chart_family = values
+        matrix = snapshots.current().feature_matrix
+        features = sorted(feature for family_features in selected for feature in family_features or [])
+        mask = select(matrix, all_of=features)
+        object_count = int(bit_counts(mask))
+        # One popcount gives every feature's count among the matching objects
+        count_by_feature = dict(zip(*feature_counts(matrix, mask)))
+
+        options = [cross_filter_options(matrix, family, count_by_feature, family_features or [])
+                   for family, family_features in zip(feature_families, selected)]
+        figure = cross_filter_figure(matrix, chart_family or 'colour', count_by_feature, object_count)
+        if not features:
+            return [None, 0, "Choose features above to list objects.", figure] + options
+        summary = f"{object_count} objects have every selected feature."
+        return [{'all_of': features}, 0, summary, figure] + options
+
+    register_clientside_callbacks(app)
+
+    for table_id in ['object-table', 'color-object-table', 'damage-object-table', 'sunburst-table', 'search-table',
+                     'cross-filter-table']:
+        register_table_callback(app, table_id)
+
+def register_table_callback(app, table_id):
+    """Serve one page of an object table for its current selection, sorting and filter."""
     @app.callback(
-        [Output('damage-distribution-chart', 'figure'),
-         Output('damage-object-table', 'data')],
-        [Input('url', 'pathname'),
-         Input('damage-distribution-chart', 'clickData')]
+        [Output(table_id, 'data'),
+         Output(table_id, 'page_count'),
+         Output(f'{table_id}-row-count', 'children')],
+        [Input(f'{table_id}-selection', 'data'),
+         Input(table_id, 'page_current'),
+         Input(table_id, 'page_size'),
+         Input(table_id, 'sort_by'),
+         Input(table_id, 'filter_query')]
     )
-    def update_damage_distribution_chart(pathname, click_data):
-        if pathname == '/damage':
-            fig = px.bar(
-                filtered_damage_counts,
-                x='Bestandteil',
-                y=filtered_damage_counts.columns[1:],
-                title='Damage Conditions by Component',
-                labels={'value': 'Count', 'variable': 'Damage Condition'}
-            )
-            fig.update_layout(barmode='stack', xaxis_tickangle=-45)
-
-            table_data = []
-            if click_data:
-                print(f"Click data: {click_data}")  # Debug print statement
-                clicked_index = click_data['points'][0]['pointIndex']
-                clicked_bestandteil = filtered_damage_counts.iloc[clicked_index]['Bestandteil']
-                print(f"Clicked Bestandteil: {clicked_bestandteil}")  # Debug print statement
-
-                for damage_type in damage_columns:
-                    if filtered_damage_counts.at[clicked_index, damage_type] > 0:
-                        print(f"Matching damage type: {damage_type}")  # Debug print statement
-                        related_ids = userfields_df[userfields_df[damage_type].notna()]['ID']
-                        table_data = get_related_objects_by_ids(merged_with_paths, related_ids)
-                        break
-
-            return fig, table_data
-
-        return go.Figure(), []
+    def update_object_table(selection, page_current, page_size, sort_by, filter_query):
+        sort_key = tuple((s['column_id'], s['direction']) for s in sort_by or [])
+        snapshot = snapshots.current()
+        result = query_table(snapshot, table_id, hashable_selection(selection), filter_query or '', sort_key)
+        table_data, page_count = page_records(result, page_current, page_size)
+        if 'FileName_paths' in result.columns:
+            add_media_links(snapshot, table_data)
+        return table_data, page_count, f"{len(result)} matching rows"
 
 # Main App Initialization
 
-# Initialize the Dash app
-app = dash.Dash(__name__, suppress_callback_exceptions=True)
-server = app.server
+def create_app():
+    """Create the Dash app with its layout and callbacks."""
+    app = dash.Dash(__name__, suppress_callback_exceptions=True)
 
-# Define the main layout
-app.layout = html.Div([
-    dcc.Location(id='url', refresh=False),
-    html.Div(id='page-content')
-])
+    # Define the main layout
+    app.layout = html.Div([
+        dcc.Location(id='url', refresh=False),
+        html.Div(id='page-content')
+    ])
 
-# Register callbacks
-register_callbacks(app)
+    # Register callbacks, timed for /metrics
+    callback_metrics = CallbackMetrics.from_environ()
+    callback_metrics.init_app(app.server)
+    register_callbacks(callback_metrics.instrument(app))
+
+    # Compress responses (registered last, so metrics record the compressed size)
+    # and serve the exported JSON and the static pages with version-tied validators
+    init_compression(app.server)
+    site_dir = os.path.dirname(os.path.abspath(__file__))
+    StaticDataServer(DATA_DIR, lambda: snapshots.current().version, site_dir).init_app(app.server)
+    return app
+
+def startup_report():
+    """Print how long start-up took (imports, each workbook and each page built so far) and the frames' memory."""
+    snapshot = snapshots.current()
+    lines = [f"  imports: {import_seconds:.2f}s"]
+    lines += [format_load_stats(os.path.basename(path), load_timings[name])
+              for name, path in zip(Tables._fields, DATA_FILES) if name in load_timings]
+    lines += memory_report(memory_usage)
+    for page in PAGE_BUILDERS:
+        seconds = snapshot.product_timings.get(page)
+        lines.append(f"  page {page}: {seconds:.2f}s" if seconds is not None else f"  page {page}: not built yet")
+    lines.append(f"  total: {time.perf_counter() - _import_start:.2f}s")
+    print("Start-up timings:\n" + "\n".join(lines))
+
+app = create_app()
+server = app.server  # Expose the Flask server
 
 if __name__ == '__main__':
+    startup_report()
+    snapshots.start()
     app.run_server(debug=True)
-
@@ -0,0 +1,70 @@
+// Chart reactions that run in the browser, registered with app.clientside_callback in app.py.
+// They restyle the figure already on the page, so a click sends no figure over the network;
+// the server is only asked for the table data of the new selection.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    crown: {
+        // Outline the clicked bar (or bar segment) of a bar chart figure
+        outlineBar: function(clickData, figure) {
+            if (!clickData || !figure) {
+                return window.dash_clientside.no_update;
+            }
+            return outlinedBarFigure(figure, clickData.points[0]);
+        },
+
+        // Enamel colour chart: outline the clicked bar and query its colour
+        selectColor: function(clickData, figure) {
+            if (!clickData || !figure) {
+                return [window.dash_clientside.no_update, window.dash_clientside.no_update];
+            }
+            const point = clickData.points[0];
+            return [outlinedBarFigure(figure, point), [point.x]];
+        },
+
+        // Damage chart: outline the clicked segment and query its component and condition.
+        // Every damage condition is one trace, named after its column.
+        selectDamageSegment: function(clickData, figure) {
+            const no_update = window.dash_clientside.no_update;
+            if (!clickData || !figure) {
+                return [no_update, no_update, no_update];
+            }
+            const point = clickData.points[0];
+            const condition = figure.data[point.curveNumber].name;
+            return [outlinedBarFigure(figure, point), [point.x], [condition]];
+        },
+
+        // Sunburst: outline the clicked node and its ancestors in black and select the node
+        // for the object table
+        highlightSunburst: function(clickData, figure) {
+            const no_update = window.dash_clientside.no_update;
+            if (!clickData || !figure) {
+                return [no_update, no_update, no_update];
+            }
+            const selectedId = clickData.points[0].id;
+            const trace = figure.data[0];
+            const highlighted = trace.ids.map(function(nodeId) {
+                return selectedId === nodeId || selectedId.startsWith(nodeId + '/');
+            });
+            const marker = Object.assign({}, trace.marker, {
+                line: {
+                    color: highlighted.map(function(h) { return h ? 'black' : 'white'; }),
+                    width: highlighted.map(function(h) { return h ? 2 : 1; })
+                }
+            });
+            const data = [Object.assign({}, trace, {marker: marker})].concat(figure.data.slice(1));
+            return [Object.assign({}, figure, {data: data}), selectedId, 0];
+        }
+    }
+});
+
+function outlinedBarFigure(figure, point) {
+    const data = figure.data.map(function(trace, i) {
+        const n = (trace.x || []).length;
+        const width = [];
+        for (let j = 0; j < n; j++) {
+            width.push(i === point.curveNumber && j === point.pointIndex ? 3 : 0);
+        }
+        const marker = Object.assign({}, trace.marker, {line: {color: 'black', width: width}});
+        return Object.assign({}, trace, {marker: marker});
+    });
+    return Object.assign({}, figure, {data: data});
+}
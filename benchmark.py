@@ -0,0 +1,282 @@
+"""Benchmarks for the data pipeline, the JSON export and the Dash callbacks.
+
+    python benchmark.py                         # real workbooks in data/
+    python benchmark.py --scale 10              # every table replicated 10x in memory
+    python benchmark.py --data-dir DIR          # another set of workbooks
+    python benchmark.py --filter callback       # only benchmarks whose name contains 'callback'
+    python benchmark.py --compare OLD.json      # print the change against an earlier run
+
+Every benchmark is run --rounds times and its min/median/mean/max wall time
+is written as JSON to benchmark-results/ (or --output), together with the
+git revision, so runs on two branches can be compared. Callbacks are called
+directly with recorded clickData payloads, without a browser or server.
+"""
+import argparse
+import datetime
+import importlib.util
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+RESULTS_DIR = 'benchmark-results'
+
+# Key columns shared between the workbooks; scaled copies shift them together
+KEY_COLUMNS = ['ObjectID', 'ID', 'ConditionID', 'CondLineItemID', 'MediaMasterID']
+
+# clickData as sent by the browser for one point of each chart handled on the server;
+# clicks on the colour, damage and sunburst charts are handled in the browser
+CLICK_DATA = {
+    'object-distribution-chart': {'points': [
+        {'curveNumber': 0, 'pointNumber': 0, 'pointIndex': 0, 'x': 'Gold', 'y': 1159, 'label': 'Gold', 'value': 1159}
+    ]},
+}
+
+# Selections of the object tables, as the chart callbacks store them
+TABLE_SELECTIONS = {
+    'object-table': 'Gold',
+    'color-object-table': {'all_of': ['opak rot (orot)'], 'any_of': [], 'none_of': []},
+    'damage-object-table': {'components': ['Kronreif'], 'conditions': ['Fehlstellen:', 'Kratzer:'], 'match': 'any'},
+    'sunburst-table': 'Claw setting/1. Perldrahtring',
+    'search-table': 'Fehlstellen Email*',
+    'cross-filter-table': {'all_of': ['component=Kronreif', 'damage=Fehlstellen:', 'setting=Claw setting']},
+}
+
+
+def time_call(fn, rounds, setup=None):
+    """Run fn rounds times and return its wall time statistics in seconds."""
+    timings = []
+    for _ in range(rounds):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.mean(timings),
+        'max': max(timings),
+        'rounds': rounds,
+    }
+
+
+def scale_tables(tables, factor):
+    """Replicate every table factor times, giving each copy its own keys.
+
+    The key columns of copy k are shifted by the same offset in every table
+    and ObjectNumbers get a suffix, so all joins between the tables still
+    match within each copy.
+    """
+    if factor <= 1:
+        return tables
+    offset = 1 + max(
+        int(df[col].max()) for df in tables.values() for col in KEY_COLUMNS
+        if col in df.columns and pd.api.types.is_numeric_dtype(df[col]) and df[col].notna().any()
+    )
+    scaled = {}
+    for name, df in tables.items():
+        copies = []
+        for k in range(factor):
+            copy = df.copy()
+            for col in KEY_COLUMNS:
+                if col in copy.columns and pd.api.types.is_numeric_dtype(copy[col]):
+                    copy[col] = copy[col] + k * offset
+            if k and 'ObjectNumber' in copy.columns:
+                copy['ObjectNumber'] = copy['ObjectNumber'].map(lambda number: f"{number}-{k}", na_action='ignore')
+            copies.append(copy)
+        scaled[name] = pd.concat(copies, ignore_index=True)
+    return scaled
+
+
+def load_module(name, path):
+    """Import a script whose file name is not a valid module name (table-to-json.py)."""
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class CallbackRecorder:
+    """Stands in for the Dash app and keeps every registered callback function."""
+
+    def __init__(self):
+        self.callbacks = {}
+
+    def callback(self, *args, **kwargs):
+        outputs = args[0] if args else kwargs['output']
+        first_output = outputs[0] if isinstance(outputs, (list, tuple)) else outputs
+
+        def register(fn):
+            name = fn.__name__
+            if name in self.callbacks or name == 'update_object_table':
+                name = f"{name}[{first_output.component_id}]"
+            self.callbacks[name] = fn
+            return fn
+        return register
+
+    def clientside_callback(self, *args, **kwargs):
+        pass
+
+
+def callback_inputs(snapshot):
+    """Recorded arguments for every callback in app.register_callbacks."""
+    categories = snapshot.medium_counts['Category'].unique().tolist()
+    inputs = {
+        'display_page': ('/damage',),
+        'update_medium_chart': (categories,),
+        'update_medium_summary': (categories, CLICK_DATA['object-distribution-chart']),
+        'update_color_query': (['opak rot (orot)'], [], ['opak weiß (owei)']),
+        'update_damage_query': (['Kronreif'], ['Fehlstellen:', 'Kratzer:'], 'any'),
+        'update_search': (TABLE_SELECTIONS['search-table'],),
+        'update_cross_filter': ([], ['component=Kronreif'], [], ['damage=Fehlstellen:'], ['setting=Claw setting'], 'colour'),
+    }
+    for table_id, selection in TABLE_SELECTIONS.items():
+        inputs[f'update_object_table[{table_id}]'] = (selection, 0, 20, [], '')
+    return inputs
+
+
+def collect_benchmarks(app, export, tables, scale):
+    """Return (name, fn, setup) for every benchmark."""
+    from dtype_plan import apply_dtype_plan
+    from excel_loader import load_workbooks
+    from export_aggregates import build_page_aggregates
+    from sunburst import create_sunburst_chart, load_sunburst_data
+
+    # The dashboard's frames, with the dtypes load_data gives them
+    app_tables = tuple(apply_dtype_plan(name, df) for name, df in zip(app.Tables._fields, (
+        tables['objects'], tables['userfields'], tables['restaurierung'],
+        tables['restaurierung_2'], tables['restaurierung_3_medien'], tables['text_entries'])))
+    version = f"benchmark-scale-{scale}"
+    versions = itertools.count()
+
+    def next_version():
+        return f"{version}-{next(versions)}"
+
+    snapshot = app.build_snapshot(app_tables, version).warm()
+    app.snapshots.swap(snapshot)
+    sunburst_df = load_sunburst_data(tables['userfields'])
+    output_dir = tempfile.mkdtemp(prefix='crown-benchmark-')
+
+    benchmarks = []
+    if scale == 1:
+        benchmarks.append(('pipeline:load_data', app.load_data, None))
+        # Every workbook parsed, with an empty cache each round
+        benchmarks.append(('pipeline:load_workbooks[uncached]', lambda: load_workbooks(
+            dict(zip(app.Tables._fields, app.DATA_FILES)), cache_dir=os.path.join(output_dir, next_version())), None))
+    benchmarks += [
+        ('pipeline:build_snapshot', lambda: app.build_snapshot(app_tables, next_version()).warm(), None),
+    ]
+    # A fresh version per round, so no cached page data is reused
+    benchmarks += [
+        (f'pipeline:preprocess[{page}]', lambda builder=builder: builder(app.Tables(*app_tables), next_version()), None)
+        for page, builder in app.PAGE_BUILDERS.items()
+    ]
+    benchmarks += [
+        ('sunburst:load_sunburst_data', lambda: load_sunburst_data(tables['userfields']), None),
+        ('sunburst:create_sunburst_chart', lambda: create_sunburst_chart(sunburst_df), None),
+        ('export:json', lambda: export.write_json_array(
+            export.build_object_documents(tables), os.path.join(output_dir, 'crown_data.json')), None),
+        ('export:ndjson', lambda: export.write_ndjson(
+            export.build_object_documents(tables), os.path.join(output_dir, 'crown_data.ndjson')), None),
+        ('export:aggregates', lambda: build_page_aggregates(tables), None),
+    ]
+
+    def clear_result_caches():
+        snapshot = app.snapshots.current()
+        snapshot.query_cache.cache_clear()
+        snapshot.figure_cache.cache_clear()
+
+    recorder = CallbackRecorder()
+    app.register_callbacks(recorder)
+    inputs = callback_inputs(snapshot)
+    for name, fn in recorder.callbacks.items():
+        if name not in inputs:
+            print(f"Skipping callback {name}: no recorded inputs")
+            continue
+        # Time the callbacks without the result caches of earlier rounds
+        benchmarks.append((f'callback:{name}', lambda fn=fn, args=inputs[name]: fn(*args), clear_result_caches))
+    return benchmarks
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    """Print the median of every benchmark next to an earlier run."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+    print(f"\n{'benchmark':55} {'before ms':>10} {'after ms':>10} {'change':>8}")
+    for name, stats in results.items():
+        if name in baseline:
+            before, after = baseline[name]['median'], stats['median']
+            print(f"{name:55} {before * 1000:10.2f} {after * 1000:10.2f} {after / before:7.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the CROWN dashboard and JSON export.")
+    parser.add_argument('--data-dir', help="workbook directory (default: data/ or $CROWN_DATA_DIR)")
+    parser.add_argument('--scale', type=int, default=1, help="replicate every table this many times")
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--filter', default='', help="only run benchmarks whose name contains this")
+    parser.add_argument('--output', help="result file (default: benchmark-results/<revision>-scale<N>.json)")
+    parser.add_argument('--compare', metavar='JSON', help="earlier result file to compare against")
+    args = parser.parse_args(argv)
+
+    # The data directory must be set before app loads its snapshot
+    if args.data_dir:
+        os.environ['CROWN_DATA_DIR'] = args.data_dir
+    import app
+    from data_cache import DATA_DIR, read_excel_cached
+    export = load_module('table_to_json', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'table-to-json.py'))
+
+    tables = export.load_tables(DATA_DIR)
+    # The export does not read the text entries; the search page does
+    tables['text_entries'] = read_excel_cached(os.path.join(DATA_DIR, 'CROWN_Objects_3_TextEntries_2024_02_02.xlsx'))
+    tables = scale_tables(tables, args.scale)
+    print(f"Benchmarking {len(tables['objects'])} objects ({args.scale}x {DATA_DIR}), {args.rounds} rounds")
+
+    results = {}
+    for name, fn, setup in collect_benchmarks(app, export, tables, args.scale):
+        if args.filter not in name:
+            continue
+        results[name] = time_call(fn, args.rounds, setup)
+        print(f"{name:55} {results[name]['median'] * 1000:10.2f} ms")
+
+    revision = git_revision()
+    output = args.output or os.path.join(RESULTS_DIR, f"{revision or 'unknown'}-scale{args.scale}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'meta': {
+                'revision': revision,
+                'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+                'data_dir': DATA_DIR,
+                'scale': args.scale,
+                'objects': len(tables['objects']),
+                'rounds': args.rounds,
+                'python': platform.python_version(),
+                'pandas': pd.__version__,
+            },
+            'results': results,
+        }, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
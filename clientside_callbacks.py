@@ -0,0 +1,49 @@
+"""Clientside callbacks: chart clicks handled in the browser.
+
+The colour, damage and sunburst figures come with the page layout, built
+once per data snapshot. Clicks on them, and on the home page bars, are
+restyled in the browser by the functions in assets/clientside.js, which
+also fill in the table selection, so the server is only asked for table
+data. Shared by the live dashboard (app.py) and the pre-rendered server
+(prerender.py).
+"""
+from dash.dependencies import ClientsideFunction, Input, Output, State
+
+
+def register_clientside_callbacks(app):
+    app.clientside_callback(
+        ClientsideFunction('crown', 'outlineBar'),
+        Output('object-distribution-chart', 'figure', allow_duplicate=True),
+        [Input('object-distribution-chart', 'clickData')],
+        [State('object-distribution-chart', 'figure')],
+        prevent_initial_call=True
+    )
+
+    app.clientside_callback(
+        ClientsideFunction('crown', 'selectColor'),
+        [Output('enamel-colors-chart', 'figure'),
+         Output('color-all-of', 'value')],
+        [Input('enamel-colors-chart', 'clickData')],
+        [State('enamel-colors-chart', 'figure')],
+        prevent_initial_call=True
+    )
+
+    app.clientside_callback(
+        ClientsideFunction('crown', 'highlightSunburst'),
+        [Output('sunburst-chart', 'figure'),
+         Output('sunburst-table-selection', 'data'),
+         Output('sunburst-table', 'page_current')],
+        [Input('sunburst-chart', 'clickData')],
+        [State('sunburst-chart', 'figure')],
+        prevent_initial_call=True
+    )
+
+    app.clientside_callback(
+        ClientsideFunction('crown', 'selectDamageSegment'),
+        [Output('damage-distribution-chart', 'figure'),
+         Output('damage-components', 'value'),
+         Output('damage-conditions', 'value')],
+        [Input('damage-distribution-chart', 'clickData')],
+        [State('damage-distribution-chart', 'figure')],
+        prevent_initial_call=True
+    )
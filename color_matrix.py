@@ -0,0 +1,65 @@
+"""Bit-packed presence matrix over the enamel colour columns.
+
+The colour flags (nullable booleans after the dtype plan, or the raw mix
+of 1, '1', 1.0 and '1.0') are normalised once into one packed bit row per
+colour, so colour counts are popcounts and combined colour queries
+(A AND B, A OR B, NOT C) are a handful of vectorized bit operations.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from dtype_plan import flag_mask
+
+# Number of set bits in every byte value
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+ColorMatrix = namedtuple('ColorMatrix', ['object_ids', 'columns', 'positions', 'bits'])
+
+
+def build_color_matrix(userfields_df, color_columns):
+    """Normalise the colour flags of userfields_df into a ColorMatrix.
+
+    bits[j] holds the packed presence flags of color_columns[j], one bit per
+    object in the order of object_ids.
+    """
+    presence = flag_mask(userfields_df[color_columns])
+    return ColorMatrix(
+        object_ids=userfields_df['ID'].to_numpy(),
+        columns=list(color_columns),
+        positions={col: j for j, col in enumerate(color_columns)},
+        bits=np.packbits(presence.T, axis=1)
+    )
+
+
+def bit_counts(bits):
+    """Return the number of set bits in each row of a packed bit array."""
+    return _POPCOUNT[bits].sum(axis=-1, dtype=np.int64)
+
+
+def color_counts(matrix):
+    """Return the number of objects showing each colour, in column order."""
+    return bit_counts(matrix.bits)
+
+
+def _rows(matrix, columns):
+    return matrix.bits[[matrix.positions[col] for col in columns if col in matrix.positions]]
+
+
+def query_colors(matrix, all_of=(), any_of=(), none_of=()):
+    """Return the IDs of objects with every colour in all_of, at least one in any_of and none in none_of.
+
+    Only objects with at least one colour recorded are considered.
+    """
+    result = np.bitwise_or.reduce(matrix.bits, axis=0)
+    all_rows = _rows(matrix, all_of)
+    if len(all_rows):
+        result &= np.bitwise_and.reduce(all_rows, axis=0)
+    any_rows = _rows(matrix, any_of)
+    if len(any_of):
+        result &= np.bitwise_or.reduce(any_rows, axis=0) if len(any_rows) else 0
+    none_rows = _rows(matrix, none_of)
+    if len(none_rows):
+        result &= ~np.bitwise_or.reduce(none_rows, axis=0)
+    mask = np.unpackbits(result, count=len(matrix.object_ids)).astype(bool)
+    return matrix.object_ids[mask]
@@ -0,0 +1,65 @@
+"""Index of the recorded damage conditions per component.
+
+The damage chart stacks one bar segment per (Bestandteil, damage condition).
+Every segment is indexed once to the sorted array of object IDs behind it,
+so a click resolves to its exact segment and queries over several
+conditions are a few numpy set operations instead of repeated column scans.
+
+A condition flag (a column ending in ':') counts for an object when it is
+set to 1, as in the cross-filter page and the exported aggregates; a flag
+recorded as 0 is no damage. The other columns (descriptions, frequencies)
+count when filled.
+"""
+from functools import reduce
+
+import numpy as np
+
+from dtype_plan import flag_mask
+
+MATCH_ALL = 'all'
+MATCH_ANY = 'any'
+
+
+def damage_presence(data, damage_columns):
+    """Return a bool frame of the damage columns, True where a row shows that damage."""
+    damage_columns = list(damage_columns)
+    present = data[damage_columns].notna()
+    flags = [col for col in damage_columns if col.endswith(':')]
+    if flags:
+        present[flags] = flag_mask(data[flags])
+    return present
+
+
+def build_damage_index(merged_data, damage_columns):
+    """Return {(Bestandteil, condition): sorted array of ObjectIDs}.
+
+    An object is listed under a condition when it shows it (see
+    damage_presence), matching the counts shown in the damage chart.
+    """
+    data = damage_presence(merged_data, damage_columns)
+    data.insert(0, 'ObjectID', merged_data['ObjectID'])
+    data.insert(1, 'Bestandteil', merged_data['Bestandteil'])
+    recorded = data.melt(id_vars=['ObjectID', 'Bestandteil'], var_name='Condition', value_name='Present')
+    recorded = recorded[recorded['Present'] & recorded['Bestandteil'].notna()]
+    return {
+        key: np.unique(ids.to_numpy())
+        for key, ids in recorded.groupby(['Bestandteil', 'Condition'], sort=False, observed=True)['ObjectID']
+    }
+
+
+def query_damage(damage_index, components=(), conditions=(), match=MATCH_ALL):
+    """Return the IDs of objects showing the given damage conditions.
+
+    With match='all' an object must show every condition, with match='any'
+    at least one of them. Empty components or conditions select all of them.
+    """
+    components = set(components or {component for component, _ in damage_index})
+    conditions = list(conditions or {condition for _, condition in damage_index})
+    combine = np.intersect1d if match == MATCH_ALL else np.union1d
+
+    # An object has a single Bestandteil, so the components are unioned
+    results = []
+    for component in components:
+        ids = [damage_index.get((component, condition), np.array([], dtype=np.int64)) for condition in conditions]
+        results.append(reduce(combine, ids))
+    return reduce(np.union1d, results, np.array([], dtype=np.int64))
@@ -0,0 +1,201 @@
+"""On-disk cache for the CROWN Excel exports.
+
+Parsing the .xlsx workbooks with openpyxl dominates worker start-up. Each
+workbook is parsed once and stored as a pickled DataFrame under data/.cache,
+keyed on the source file's path, size, mtime and content hash. The cache is
+rebuilt automatically when a workbook changes.
+
+The dashboard reads only some columns of each workbook and caches those
+(see excel_loader.py, which also prebuilds them during deploy). The full
+frames read by read_excel_cached, e.g. by table-to-json.py, can be
+prebuilt with:
+
+    python data_cache.py            # every workbook in data/
+    python data_cache.py FILE ...   # selected workbooks
+"""
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+# CROWN_DATA_DIR points the dashboard and the tools at another set of workbooks
+DATA_DIR = os.environ.get('CROWN_DATA_DIR', 'data')
+CACHE_DIR = os.path.join(DATA_DIR, '.cache')
+MANIFEST_FILE = 'manifest.json'
+# Title of the header-only workbooks synthetic_data.py writes; their rows exist only in the cache
+CACHE_ONLY_TITLE = 'CROWN synthetic workbook, rows in cache only'
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _manifest_path(cache_dir):
+    return os.path.join(cache_dir, MANIFEST_FILE)
+
+
+def load_manifest(cache_dir=CACHE_DIR):
+    """Load the cache manifest, or an empty one if it is missing or unreadable."""
+    try:
+        with open(_manifest_path(cache_dir), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _atomic_write(path, write):
+    # Write to a private temporary file first so that concurrent workers
+    # never read a half-written cache entry.
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _save_manifest(manifest, cache_dir):
+    def write(tmp_path):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+    _atomic_write(_manifest_path(cache_dir), write)
+
+
+def _cache_key(path, variant=None):
+    key = os.path.normpath(path)
+    return key if variant is None else f"{key}#{variant}"
+
+
+def _cache_file_name(path, sha256, variant=None):
+    base = os.path.splitext(os.path.basename(path))[0]
+    if variant is not None:
+        base = f"{base}.{variant}"
+    return f"{base}.{sha256[:16]}.pkl"
+
+
+def load_cached(path, cache_dir=CACHE_DIR, variant=None):
+    """Return the cached frame of a workbook, or None if the cache has no valid entry.
+
+    A cache entry is reused when the workbook's size and mtime are unchanged.
+    If only the mtime changed (e.g. a fresh checkout), the content hash
+    decides. variant names a subset of the workbook's columns cached on its
+    own (see excel_loader.py).
+    """
+    stat = os.stat(path)
+    manifest = load_manifest(cache_dir)
+    entry = manifest.get(_cache_key(path, variant))
+
+    if entry and entry.get('pandas') == pd.__version__:
+        cache_path = os.path.join(cache_dir, entry['cache_file'])
+        if os.path.exists(cache_path):
+            if entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+                return pd.read_pickle(cache_path)
+            sha256 = file_hash(path)
+            if entry['sha256'] == sha256:
+                entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                _save_manifest(manifest, cache_dir)
+                return pd.read_pickle(cache_path)
+    return None
+
+
+def check_has_rows(path, book=None):
+    """Raise ValueError if the workbook at path (or its open openpyxl book) is a header-only synthetic workbook.
+
+    Such a workbook has its rows in the cache only; parsing it would quietly
+    give an empty frame once its cache entry is gone.
+    """
+    if book is None:
+        import openpyxl
+        book = openpyxl.load_workbook(path, read_only=True)
+        try:
+            title = book.properties.title
+        finally:
+            book.close()
+    else:
+        title = book.properties.title
+    if title == CACHE_ONLY_TITLE:
+        raise ValueError(f"{path} has its rows in the workbook cache only, and the cache has no valid entry "
+                         f"for it; generate the data again with synthetic_data.py")
+
+
+def read_excel_cached(path, cache_dir=CACHE_DIR):
+    """Read an Excel workbook, going through the on-disk cache.
+
+    The workbook is parsed again, and its cache entry replaced, whenever
+    load_cached finds no valid entry.
+    """
+    df = load_cached(path, cache_dir)
+    if df is None:
+        check_has_rows(path)
+        df = pd.read_excel(path)
+        store_cached(path, df, cache_dir)
+    return df
+
+
+def store_cached(path, df, cache_dir=CACHE_DIR, variant=None):
+    """Record df as the cached contents of the workbook at path, or of its column subset variant.
+
+    read_excel_cached calls this after parsing a workbook; the synthetic data
+    generator uses it to write its tables straight into the cache.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    key = _cache_key(path, variant)
+    stat = os.stat(path)
+    sha256 = file_hash(path)
+    cache_file = _cache_file_name(path, sha256, variant)
+    _atomic_write(os.path.join(cache_dir, cache_file), df.to_pickle)
+
+    # Re-read the manifest so entries written by other workers are kept
+    manifest = load_manifest(cache_dir)
+    old_entry = manifest.get(key)
+    if old_entry and old_entry['cache_file'] != cache_file:
+        try:
+            os.remove(os.path.join(cache_dir, old_entry['cache_file']))
+        except OSError:
+            pass
+    manifest[key] = {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': sha256,
+        'pandas': pd.__version__,
+        'cache_file': cache_file,
+    }
+    _save_manifest(manifest, cache_dir)
+
+
+def data_version(paths, cache_dir=CACHE_DIR):
+    """Return a short digest identifying the current contents of the given workbooks."""
+    manifest = load_manifest(cache_dir)
+    digest = hashlib.sha256()
+    for path in paths:
+        key = os.path.normpath(path)
+        # Any entry of the workbook, full or a column subset, records its hash
+        entry = manifest.get(key) or next(
+            (entry for name, entry in manifest.items() if name.startswith(key + '#')), None)
+        stat = os.stat(path)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            sha256 = entry['sha256']
+        else:
+            sha256 = file_hash(path)
+        digest.update(f"{key}:{sha256}\n".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def prebuild(paths, cache_dir=CACHE_DIR):
+    """Populate the cache for the given workbooks."""
+    for path in paths:
+        start = time.perf_counter()
+        df = read_excel_cached(path, cache_dir)
+        elapsed = time.perf_counter() - start
+        print(f"{path}: {df.shape[0]} rows x {df.shape[1]} columns cached in {elapsed:.2f}s")
+
+
+if __name__ == '__main__':
+    paths = sys.argv[1:] or sorted(glob.glob(os.path.join(DATA_DIR, '*.xlsx')))
+    prebuild(paths)
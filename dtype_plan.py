@@ -0,0 +1,113 @@
+"""Explicit dtypes for the workbooks the dashboard keeps in memory.
+
+pandas reads every text column as object (one Python string per cell) and
+every flag column as float64, or as a mix of 1, '1', 1.0 and '1.0'. The
+plan below is applied once at load:
+
+- 'integer': IDs and other integer columns, downcast to the smallest
+  integer type that holds them;
+- 'category': columns with few distinct values, such as Medium and
+  Bestandteil;
+- 'flag': colour and damage flags, as nullable booleans. An empty cell
+  stays NA, so notna() counts are unchanged. A flag column holding any
+  other value (free text) keeps its dtype.
+
+In the userfields workbook every other text column whose distinct values
+are at most CATEGORY_MAX_RATIO of its filled cells becomes a category too.
+"""
+import pandas as pd
+
+from static_data import color_columns, damage_columns
+
+FLAG_VALUES = [1, '1', 1.0, '1.0']
+FALSE_VALUES = [0, '0', 0.0, '0.0']
+
+CATEGORY_MAX_RATIO = 0.5
+
+# Every planned column must be read by excel_loader.COLUMN_MANIFEST (see tests/test_dtype_plan.py)
+DTYPE_PLAN = {
+    'objects_df': {
+        'ObjectID': 'integer', 'DateBegin': 'integer', 'DateEnd': 'integer',
+        'Medium': 'category', 'Bestandteil': 'category', 'ObjectName': 'category',
+    },
+    'userfields_df': {
+        'ID': 'integer',
+        **{col: 'flag' for col in color_columns},
+        **{col: 'flag' for col in damage_columns if col.endswith(':')},
+    },
+    'restaurierung_1_df': {'ID': 'integer', 'ConditionID': 'integer'},
+    'restaurierung_2_df': {'ConditionID': 'integer', 'CondLineItemID': 'integer', 'Statement': 'category'},
+    'paths_df': {'CondLineItemID': 'integer'},
+    'text_entries_df': {'ID': 'integer', 'TextType': 'category'},
+}
+
+# Frames whose remaining low-cardinality text columns become categories
+REPEATED_TEXT_FRAMES = ('userfields_df',)
+
+
+def to_flag(series):
+    """Convert a flag column to a nullable boolean; return it unchanged if it holds other values."""
+    if series.dtype == 'boolean':
+        return series
+    truthy = series.isin(FLAG_VALUES)
+    if not (truthy | series.isin(FALSE_VALUES) | series.isna()).all():
+        return series
+    return truthy.astype('boolean').mask(series.isna())
+
+
+def to_compact_integer(series):
+    if not pd.api.types.is_integer_dtype(series.dtype):
+        return series
+    return pd.to_numeric(series, downcast='integer')
+
+
+def to_category(series):
+    return series.astype('category')
+
+
+CONVERTERS = {'integer': to_compact_integer, 'category': to_category, 'flag': to_flag}
+
+
+def is_repeated_text(series):
+    """Whether an object column has few enough distinct values to store as a category."""
+    if series.dtype != object:
+        return False
+    filled = series.notna().sum()
+    return filled > 0 and series.nunique() <= filled * CATEGORY_MAX_RATIO
+
+
+def apply_dtype_plan(name, df):
+    """Return a copy of the frame called name with the dtypes of DTYPE_PLAN."""
+    plan = {col: kind for col, kind in DTYPE_PLAN.get(name, {}).items() if col in df.columns}
+    if name in REPEATED_TEXT_FRAMES:
+        plan.update({col: 'category' for col in df.columns if col not in plan and is_repeated_text(df[col])})
+    if not plan:
+        return df
+    converted = {col: CONVERTERS[kind](df[col]) for col, kind in plan.items()}
+    # Build the frame in one go; assigning hundreds of columns one by one fragments it
+    return pd.DataFrame({col: converted.get(col, df[col]) for col in df.columns}, index=df.index)
+
+
+def flag_mask(df):
+    """Return a numpy bool array, True where a flag in df is set; NA counts as not set."""
+    if all(dtype == 'boolean' for dtype in df.dtypes):
+        return df.to_numpy(dtype=bool, na_value=False)
+    return df.isin(FLAG_VALUES).to_numpy()
+
+
+def frame_memory(df):
+    """Bytes used by df, counting the strings in object columns."""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def memory_report(usage):
+    """Format {frame name: (bytes before, bytes after)} as report lines."""
+    lines = []
+    for name, (before, after) in usage.items():
+        saved = 1 - after / before if before else 0
+        lines.append(f"  memory {name}: {before / 1e6:.2f} MB -> {after / 1e6:.2f} MB ({saved:.0%} less)")
+    total_before = sum(before for before, _ in usage.values())
+    total_after = sum(after for _, after in usage.values())
+    if len(usage) > 1:
+        lines.append(f"  memory total: {total_before / 1e6:.2f} MB -> {total_after / 1e6:.2f} MB")
+    return lines
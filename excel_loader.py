@@ -0,0 +1,168 @@
+"""Parallel, column-pruned reading of the workbooks the dashboard loads.
+
+pd.read_excel builds an openpyxl cell object for every cell of a sheet and
+infers the type of every column, although the dashboard reads only a few
+of them: about 100 of the 469 columns of the userfields workbook.
+read_workbook streams the first sheet with openpyxl in read-only mode,
+keeps the columns COLUMN_MANIFEST declares for the frame and passes only
+those to pandas' TextParser, so each kept column gets the type
+pd.read_excel would give it. The explicit dtypes of dtype_plan.py are
+applied afterwards, as before.
+
+load_workbooks reads the workbooks missing from the on-disk cache in
+parallel, one process each (LOAD_WORKERS, default one per CPU), and caches
+the pruned frames under a variant named after their columns. A workbook
+with only a full-frame cache entry (e.g. from table-to-json.py or the
+synthetic data generator) is pruned from that entry instead of parsed.
+A column added to the manifest changes the variant, so the workbooks are
+read again.
+
+Prebuild the cache during deploy with:
+
+    python excel_loader.py
+"""
+import hashlib
+import json
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from data_cache import CACHE_DIR, DATA_DIR, check_has_rows, load_cached, store_cached
+from static_data import (color_columns, damage_columns, settings_columns, table_columns,
+                         drill_holes_column, non_fitting_columns, cut_forms_columns, pearl_columns)
+
+# The workbook of each frame, in DATA_DIR (see app.Tables)
+WORKBOOKS = {
+    'objects_df': 'CROWN_Objects_1_2024_02_02.xlsx',
+    'userfields_df': 'crown-userfields.xlsx',
+    'restaurierung_1_df': 'CROWN_Restaurierung_1_2024_02_02.xlsx',
+    'restaurierung_2_df': 'CROWN_Restaurierung_2_2024_02_02.xlsx',
+    'paths_df': 'CROWN_Restaurierung_3_Medien_2024_02_02.xlsx',
+    'text_entries_df': 'CROWN_Objects_3_TextEntries_2024_02_02.xlsx',
+}
+
+# The columns read from each workbook, by frame name (see app.Tables); None reads every column.
+# A column the callbacks or page builders read must be listed here.
+COLUMN_MANIFEST = {
+    'objects_df': table_columns + ['SortNumber'],
+    'userfields_df': ['ID'] + color_columns + damage_columns
+    + [col for columns in settings_columns.values() for col in columns]
+    + [drill_holes_column] + non_fitting_columns + cut_forms_columns + pearl_columns,
+    'restaurierung_1_df': ['ID', 'ObjectNumber', 'ConditionID'],
+    'restaurierung_2_df': ['ConditionID', 'CondLineItemID', 'Treatment', 'Statement'],
+    'paths_df': ['CondLineItemID', 'FileName'],
+    'text_entries_df': ['ID', 'TextType', 'TextEntry'],
+}
+
+# How one workbook was loaded: from the cache or parsed, in how many seconds,
+# and how many of its columns were kept (columns_total is None when cached)
+LoadStats = namedtuple('LoadStats', ['source', 'seconds', 'rows', 'columns', 'columns_total'])
+
+
+def column_variant(columns):
+    """Cache variant name of a column subset; None for every column."""
+    if columns is None:
+        return None
+    canonical = json.dumps(list(dict.fromkeys(columns)), ensure_ascii=False)
+    return 'cols-' + hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:12]
+
+
+def _cell_value(value):
+    # As pandas' openpyxl reader: whole floats become ints, empty cells ''
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def read_workbook(path, columns=None):
+    """Parse the first sheet of a workbook into a DataFrame of the given columns (all if None).
+
+    Columns missing from the workbook are skipped. Returns (df, LoadStats).
+    """
+    import openpyxl
+    from pandas.io.parsers import TextParser
+
+    start = time.perf_counter()
+    book = openpyxl.load_workbook(path, read_only=True, data_only=True, keep_links=False)
+    try:
+        check_has_rows(path, book)
+        sheet = book.worksheets[0]
+        # The stored dimensions of exported sheets are not always right
+        sheet.reset_dimensions()
+        rows = sheet.iter_rows(values_only=True)
+        header = list(next(rows, ()))
+        wanted = set(header if columns is None else columns)
+        positions = [i for i, name in enumerate(header) if name in wanted]
+        data = [[_cell_value(header[i]) for i in positions]]
+        last_filled = 0
+        for row in rows:
+            if any(value is not None and value != '' for value in row):
+                last_filled = len(data)
+            data.append([_cell_value(row[i]) if i < len(row) else '' for i in positions])
+    finally:
+        book.close()
+
+    # Trailing empty rows are dropped, as pd.read_excel does
+    del data[last_filled + 1:]
+    df = TextParser(data, header=0, skip_blank_lines=False).read()
+    return df, LoadStats('parsed', time.perf_counter() - start, len(df), len(df.columns), len(header))
+
+
+def _load_cached(path, columns, cache_dir):
+    """The pruned frame of a workbook from its own cache entry or its full-frame entry, or None."""
+    variant = column_variant(columns)
+    df = load_cached(path, cache_dir, variant)
+    if df is None and variant is not None:
+        full = load_cached(path, cache_dir)
+        if full is not None:
+            df = full[[col for col in full.columns if col in set(columns)]]
+            store_cached(path, df, cache_dir, variant)
+    return df
+
+
+def load_workbooks(workbooks, cache_dir=CACHE_DIR, max_workers=None):
+    """Load {name: path} with the columns of COLUMN_MANIFEST; return {name: (df, LoadStats)} in input order."""
+    if max_workers is None:
+        max_workers = int(os.environ.get('LOAD_WORKERS', os.cpu_count() or 1))
+    loaded = {}
+    pending = {}
+    for name, path in workbooks.items():
+        start = time.perf_counter()
+        df = _load_cached(path, COLUMN_MANIFEST.get(name), cache_dir)
+        if df is None:
+            pending[name] = path
+        else:
+            loaded[name] = (df, LoadStats('cache', time.perf_counter() - start, len(df), len(df.columns), None))
+
+    workers = min(max_workers, len(pending))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {name: executor.submit(read_workbook, path, COLUMN_MANIFEST.get(name))
+                       for name, path in pending.items()}
+            parsed = {name: future.result() for name, future in futures.items()}
+    else:
+        parsed = {name: read_workbook(path, COLUMN_MANIFEST.get(name)) for name, path in pending.items()}
+
+    # Write the cache here, not in the workers, so they never race on the cache manifest
+    for name, (df, stats) in parsed.items():
+        store_cached(pending[name], df, cache_dir, column_variant(COLUMN_MANIFEST.get(name)))
+        loaded[name] = (df, stats)
+    return {name: loaded[name] for name in workbooks}
+
+
+def format_load_stats(name, stats):
+    """One start-up report line for a loaded workbook."""
+    if stats.source == 'cache':
+        return f"  read {name}: {stats.seconds:.2f}s (cache, {stats.columns} columns)"
+    return f"  read {name}: {stats.seconds:.2f}s (parsed {stats.columns} of {stats.columns_total} columns)"
+
+
+if __name__ == '__main__':
+    start = time.perf_counter()
+    workbooks = {name: os.path.join(DATA_DIR, file_name) for name, file_name in WORKBOOKS.items()}
+    for name, (df, stats) in load_workbooks(workbooks).items():
+        print(format_load_stats(name, stats))
+    print(f"Cached the dashboard's workbooks in {time.perf_counter() - start:.2f}s")
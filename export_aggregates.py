@@ -0,0 +1,114 @@
+"""Precomputed aggregate bundles for the static D3 pages in js/.
+
+Each page loads one small file from data/aggregates/ instead of the full
+crown_data.json, and fetches single objects from the shard export
+(table-to-json.py --format shards) only when the user asks for details.
+"""
+import json
+import os
+
+import pandas as pd
+
+from static_data import damage_columns, settings_columns
+
+FLAG_VALUES = [1, '1', 1.0, '1.0']
+
+
+def _records(df):
+    """Convert df to records with NaN replaced by None, so the output is strict JSON."""
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
+def _enamel_objects(objects_df):
+    return objects_df[objects_df['Medium'] == 'Email']
+
+
+def enamel_colors(objects_df):
+    """Enamel colour counts and the components using each colour (enamel-color-explorer)."""
+    colors = []
+    for name, group in _enamel_objects(objects_df).groupby('ObjectName', sort=False):
+        colors.append({
+            'name': name,
+            'value': len(group),
+            'components': sorted(group['Bestandteil'].dropna().unique().tolist())
+        })
+    return colors
+
+
+def enamel_samples(objects_df):
+    """The enamel samples offered in the sample pickers."""
+    return _records(_enamel_objects(objects_df)[['ObjectID', 'ObjectName', 'Bestandteil']])
+
+
+def degradation_by_component(objects_df, userfields_df):
+    """Number of objects per component showing each damage condition."""
+    flag_columns = [col for col in damage_columns if col.endswith(':') and col in userfields_df.columns]
+    merged = objects_df[['ObjectID', 'Bestandteil']].merge(
+        userfields_df[['ID'] + flag_columns], left_on='ObjectID', right_on='ID', how='inner'
+    )
+    counts = merged[flag_columns].isin(FLAG_VALUES).groupby(merged['Bestandteil']).sum()
+    counts = counts.loc[counts.sum(axis=1) > 0]
+    return [
+        {
+            'Bestandteil': bestandteil,
+            'conditions': {col.rstrip(':'): int(count) for col, count in row.items() if count}
+        }
+        for bestandteil, row in counts.iterrows()
+    ]
+
+
+def setting_type_timeline(objects_df, userfields_df):
+    """Objects per setting type and dating range (setting-type-timeline).
+
+    An object belongs to a setting type when any of that setting's columns
+    is filled; objects without any setting columns are listed as 'Unknown'.
+    """
+    memberships = []
+    for setting, columns in settings_columns.items():
+        available_columns = [col for col in columns if col in userfields_df.columns]
+        has_setting = userfields_df[available_columns].notna().any(axis=1)
+        memberships.append(pd.DataFrame({'SettingType': setting, 'ObjectID': userfields_df.loc[has_setting, 'ID']}))
+    membership = pd.concat(memberships, ignore_index=True)
+    unknown_ids = objects_df.loc[~objects_df['ObjectID'].isin(membership['ObjectID']), 'ObjectID']
+    membership = pd.concat([membership, pd.DataFrame({'SettingType': 'Unknown', 'ObjectID': unknown_ids})], ignore_index=True)
+
+    timeline = membership.merge(objects_df[['ObjectID', 'DateBegin', 'DateEnd', 'Bestandteil']], on='ObjectID')
+    timeline = timeline.groupby(['SettingType', 'DateBegin', 'DateEnd'], sort=False).agg(
+        count=('ObjectID', 'nunique'),
+        components=('Bestandteil', lambda values: sorted(values.dropna().unique().tolist()))
+    ).reset_index()
+    return _records(timeline)
+
+
+def intervention_counts(objects_df, restaurierung_df):
+    """Number of interventions per object (intervention-impact-visualizer)."""
+    counts = restaurierung_df.groupby('ObjectNumber').size()
+    objects = objects_df[['ObjectID', 'Bestandteil']].copy()
+    objects['Interventions'] = objects_df['ObjectNumber'].map(counts).fillna(0).astype(int)
+    return _records(objects)
+
+
+def build_page_aggregates(tables):
+    """Return {file name: payload} for every static page."""
+    objects_df = tables['objects']
+    userfields_df = tables['userfields']
+    return {
+        'enamel-colors': enamel_colors(objects_df),
+        'enamel-samples': enamel_samples(objects_df),
+        'enamel-degradation': {
+            'samples': enamel_samples(objects_df),
+            'by_component': degradation_by_component(objects_df, userfields_df)
+        },
+        'setting-type-timeline': setting_type_timeline(objects_df, userfields_df),
+        'intervention-counts': intervention_counts(objects_df, tables['restaurierung']),
+    }
+
+
+def write_page_aggregates(tables, out_dir):
+    """Write every aggregate bundle as compact JSON into out_dir."""
+    os.makedirs(out_dir, exist_ok=True)
+    aggregates = build_page_aggregates(tables)
+    for name, payload in aggregates.items():
+        with open(os.path.join(out_dir, f"{name}.json"), 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False, allow_nan=False, separators=(',', ':'))
+    return sorted(aggregates)
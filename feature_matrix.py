@@ -0,0 +1,101 @@
+"""Object × feature matrix for filtering across the dashboard's pages.
+
+Every object is described by features of several families: its medium
+tokens, its component (Bestandteil), its enamel colours, its damage
+conditions and its setting types. A feature is named 'family=value', e.g.
+'medium=Email' or 'colour=opak rot (orot)'. The matrix keeps one packed bit
+row per feature over all objects, like the colour matrix (see
+color_matrix.py), so a combined filter such as medium=Email AND
+colour=opak rot AND damage=Riss/Bruch: is a few bit operations, and the
+number of matching objects having each feature (conditional counts) is a
+single popcount over the whole matrix.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from color_matrix import bit_counts
+
+FeatureMatrix = namedtuple('FeatureMatrix', ['object_ids', 'features', 'positions', 'families', 'bits'])
+
+
+def feature_id(family, value):
+    return f"{family}={value}"
+
+
+def split_feature(feature):
+    """Return (family, value) of a feature name."""
+    family, _, value = feature.partition('=')
+    return family, value
+
+
+def build_feature_matrix(object_ids, families):
+    """Build a FeatureMatrix over object_ids.
+
+    families maps each family to {value: IDs of the objects with that
+    value}, in the order the features should have. IDs not in object_ids
+    are ignored.
+    """
+    object_ids = np.asarray(object_ids)
+    features = []
+    family_rows = {}
+    presence = []
+    for family, values in families.items():
+        start = len(features)
+        for value, ids in values.items():
+            presence.append(np.isin(object_ids, ids))
+            features.append(feature_id(family, value))
+        family_rows[family] = range(start, len(features))
+
+    presence = np.array(presence, dtype=bool).reshape(len(features), len(object_ids))
+    return FeatureMatrix(
+        object_ids=object_ids,
+        features=features,
+        positions={feature: i for i, feature in enumerate(features)},
+        families=family_rows,
+        bits=np.packbits(presence, axis=1)
+    )
+
+
+def select(matrix, all_of=(), any_of=(), none_of=()):
+    """Return the packed mask of objects with every feature in all_of, at least one in any_of and none in none_of.
+
+    An unknown feature in all_of or any_of matches no object.
+    """
+    width = matrix.bits.shape[1]
+    mask = np.packbits(np.ones(len(matrix.object_ids), dtype=bool))
+    for feature in all_of:
+        position = matrix.positions.get(feature)
+        mask &= matrix.bits[position] if position is not None else np.zeros(width, dtype=np.uint8)
+    if len(any_of):
+        rows = [matrix.bits[matrix.positions[feature]] for feature in any_of if feature in matrix.positions]
+        mask &= np.bitwise_or.reduce(rows, axis=0) if rows else 0
+    rows = [matrix.bits[matrix.positions[feature]] for feature in none_of if feature in matrix.positions]
+    if rows:
+        mask &= ~np.bitwise_or.reduce(rows, axis=0)
+    return mask
+
+
+def selected_ids(matrix, mask):
+    """Return the IDs of the objects in a packed mask."""
+    return matrix.object_ids[np.unpackbits(mask, count=len(matrix.object_ids)).astype(bool)]
+
+
+def query_features(matrix, all_of=(), any_of=(), none_of=()):
+    """Return the IDs of the objects matching a feature filter (see select)."""
+    return selected_ids(matrix, select(matrix, all_of, any_of, none_of))
+
+
+def family_features(matrix, family):
+    """Return the features of a family, in matrix order."""
+    rows = matrix.families[family]
+    return matrix.features[rows.start:rows.stop]
+
+
+def feature_counts(matrix, mask=None, family=None):
+    """Return (features, counts): how many objects of mask (all if None) have each feature of family (all if None)."""
+    rows = matrix.families[family] if family is not None else range(len(matrix.features))
+    bits = matrix.bits[rows.start:rows.stop]
+    if mask is not None:
+        bits = bits & mask
+    return matrix.features[rows.start:rows.stop], bit_counts(bits)
@@ -0,0 +1,62 @@
+"""Gunicorn settings for serving the dashboard in production.
+
+The app is imported once in the master process (preload_app), which loads
+and preprocesses every dataset before the workers are forked. The workers
+then share the data through copy-on-write instead of each building its own
+copy. Following the gc.freeze() recipe, garbage collection is paused in the
+master and the loaded objects are moved to the permanent generation before
+the fork, so collections in the workers do not write to the shared pages.
+
+The master also watches data/ (DATA_RELOAD_INTERVAL seconds, default 30;
+0 disables it). When a workbook changes it sends itself a HUP: on_reload
+rebuilds the data snapshot once, in the master, and gunicorn then forks
+fresh workers that share it and gracefully stops the old ones, which keep
+serving the previous data until then. A manual HUP reloads the data too.
+
+    gunicorn -c gunicorn.conf.py app:server
+"""
+import gc
+import os
+import signal
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+preload_app = True
+
+# Avoid freed holes in the pages loaded by the master
+gc.disable()
+
+
+def when_ready(server):
+    # Page data is built lazily; build all of it once here so the workers
+    # share it instead of each building its own on first use.
+    import app
+    app.snapshots.current().warm()
+    app.startup_report()
+
+    # The app has been preloaded; move everything it allocated out of the
+    # collector's reach before the first worker is forked.
+    gc.freeze()
+    server.log.info("Froze %d objects before forking workers", gc.get_freeze_count())
+
+    app.snapshots.start(on_change=lambda: os.kill(os.getpid(), signal.SIGHUP))
+
+
+def on_reload(server):
+    # Runs in the master on HUP, before the new workers are forked
+    import app
+    gc.unfreeze()
+    try:
+        app.snapshots.reload()
+    except Exception:
+        server.log.exception("Data snapshot reload failed; the new workers keep the previous data")
+    # Free the previous snapshot, then freeze the new one like the first
+    gc.collect()
+    gc.freeze()
+    server.log.info("Froze %d objects before forking workers", gc.get_freeze_count())
+
+
+def post_fork(server, worker):
+    gc.enable()
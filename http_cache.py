@@ -0,0 +1,195 @@
+"""Compression and HTTP caching for the dashboard server.
+
+- Callback responses (_dash-update-component) and the Dash layout are
+  compressed with brotli or gzip, whichever the browser accepts. brotli is
+  optional; without the package only gzip is offered.
+- The Dash component bundles (plotly.js and friends) are compressed once
+  per process and then served from memory.
+- The exported JSON under data/ (crown_data*, aggregates/, written by
+  table-to-json.py) is served at /data/; nothing else below data/ is, in
+  particular not the parse cache in data/.cache/. Pre-compressed .br/.gz
+  siblings (table-to-json.py --precompress) are used when present. Every
+  response carries a strong ETag derived from the data snapshot version
+  and the file contents, plus 'Cache-Control: no-cache', so repeat
+  visitors revalidate and get a 304 instead of the file.
+- The static D3 pages (index.html, js/, css/, images/) are served at
+  /explorer/, with the export at /explorer/data/ where their relative
+  'data/...' requests go, so they get the same validators.
+"""
+import gzip
+import os
+import threading
+
+from flask import Response, abort, redirect, request, send_file
+from werkzeug.utils import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIN_COMPRESS_SIZE = 1024
+COMPRESSED_PATHS = ('/_dash-update-component', '/_dash-layout', '/_dash-dependencies')
+BUNDLE_PATH = '/_dash-component-suites/'
+STATIC_DATA_EXTENSIONS = ('.json', '.ndjson')
+# The outputs of table-to-json.py below the data directory
+EXPORT_PATHS = ('crown_data', 'aggregates/')
+SITE_PATH = '/explorer'
+# The static site's directories; its pages are the .html files at the top
+SITE_DIRS = ('js/', 'css/', 'images/')
+
+# Content-Encoding -> file suffix, in order of preference
+ENCODINGS = {'br': '.br', 'gzip': '.gz'}
+
+
+def accepted_encoding(available=None):
+    """Return the preferred encoding the request accepts, or None."""
+    for encoding in ENCODINGS:
+        if encoding == 'br' and brotli is None:
+            continue
+        if available is not None and encoding not in available:
+            continue
+        if request.accept_encodings[encoding]:
+            return encoding
+    return None
+
+
+def compress(data, encoding, level=None):
+    if encoding == 'br':
+        return brotli.compress(data, quality=5 if level is None else level)
+    return gzip.compress(data, compresslevel=6 if level is None else level, mtime=0)
+
+
+def precompress(path):
+    """Write .br (when brotli is installed) and .gz siblings of a file, or of every JSON file below a directory."""
+    if os.path.isdir(path):
+        paths = [os.path.join(root, name) for root, _, names in os.walk(path) for name in names
+                 if name.endswith(STATIC_DATA_EXTENSIONS)]
+    else:
+        paths = [path]
+    for source in paths:
+        with open(source, 'rb') as f:
+            data = f.read()
+        for encoding, suffix in ENCODINGS.items():
+            if encoding == 'br' and brotli is None:
+                continue
+            with open(source + suffix, 'wb') as f:
+                f.write(compress(data, encoding, level=11 if encoding == 'br' else 9))
+    return len(paths)
+
+
+def is_hidden(filename):
+    """True when a segment of filename starts with a dot, e.g. .cache/."""
+    return any(part.startswith('.') for part in filename.replace('\\', '/').split('/'))
+
+
+def _set_encoded_body(response, body, encoding):
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    response.headers['Content-Length'] = str(len(body))
+    response.vary.add('Accept-Encoding')
+
+
+def init_compression(server):
+    """Compress callback responses and the Dash component bundles on the Flask server."""
+    bundle_cache = {}
+    bundle_lock = threading.Lock()
+
+    @server.after_request
+    def compress_response(response):
+        is_bundle = request.path.startswith(BUNDLE_PATH)
+        if not (is_bundle or request.path.endswith(COMPRESSED_PATHS)):
+            return response
+        if response.status_code != 200 or response.direct_passthrough or 'Content-Encoding' in response.headers:
+            return response
+        encoding = accepted_encoding()
+        if encoding is None:
+            return response
+        body = response.get_data()
+        if len(body) < MIN_COMPRESS_SIZE:
+            return response
+
+        if is_bundle:
+            # Bundle URLs carry the package version, so the path and size identify the contents
+            key = (request.path, len(body), encoding)
+            compressed = bundle_cache.get(key)
+            if compressed is None:
+                compressed = compress(body, encoding, level=11 if encoding == 'br' else 9)
+                with bundle_lock:
+                    bundle_cache[key] = compressed
+        else:
+            compressed = compress(body, encoding)
+        _set_encoded_body(response, compressed, encoding)
+        return response
+
+
+class StaticDataServer:
+    """Serves the exported JSON files, and optionally the static site reading them, with validators tied to the data version."""
+
+    def __init__(self, data_dir, version, site_dir=None):
+        self.data_dir = data_dir
+        self.version = version
+        self.site_dir = site_dir
+        self._digests = {}
+
+    def digest(self, path):
+        """Content digest of a file, recomputed only when its size or mtime changes."""
+        stat = os.stat(path)
+        key = (path, stat.st_size, stat.st_mtime_ns)
+        digest = self._digests.get(key)
+        if digest is None:
+            # data_cache imports pandas, which the pre-rendered server (prerender.py) does without
+            from data_cache import file_hash
+            digest = file_hash(path)[:16]
+            self._digests[key] = digest
+        return digest
+
+    def etag(self, path, encoding):
+        suffix = f"-{encoding}" if encoding else ''
+        return f"{self.version()}-{self.digest(path)}{suffix}"
+
+    def _precompressed(self, path):
+        """Encodings with an up-to-date pre-compressed sibling of path."""
+        mtime = os.stat(path).st_mtime_ns
+        return {encoding for encoding, suffix in ENCODINGS.items()
+                if os.path.exists(path + suffix) and os.stat(path + suffix).st_mtime_ns >= mtime}
+
+    def serve(self, filename):
+        if not filename.endswith(STATIC_DATA_EXTENSIONS) or not filename.startswith(EXPORT_PATHS) or is_hidden(filename):
+            abort(404)
+        path = safe_join(self.data_dir, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+
+        encoding = accepted_encoding(self._precompressed(path))
+        etag = self.etag(path, encoding)
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            body_path = path + ENCODINGS[encoding] if encoding else path
+            response = send_file(body_path, mimetype='application/json', conditional=False, etag=False)
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'public, no-cache'
+        response.vary.add('Accept-Encoding')
+        return response
+
+    def serve_site(self, filename):
+        is_page = filename.endswith('.html') and '/' not in filename
+        if not (is_page or filename.startswith(SITE_DIRS)) or is_hidden(filename):
+            abort(404)
+        path = safe_join(self.site_dir, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        # ETag and Last-Modified of the file itself
+        response = send_file(path, conditional=True)
+        response.headers['Cache-Control'] = 'public, no-cache'
+        return response
+
+    def init_app(self, server):
+        server.add_url_rule('/data/<path:filename>', 'static_data', self.serve)
+        if self.site_dir is not None:
+            server.add_url_rule(f'{SITE_PATH}/', 'static_site_index', lambda: redirect(f'{SITE_PATH}/index.html'))
+            server.add_url_rule(f'{SITE_PATH}/data/<path:filename>', 'static_site_data', self.serve)
+            server.add_url_rule(f'{SITE_PATH}/<path:filename>', 'static_site', self.serve_site)
@@ -0,0 +1,17 @@
+// crown-data.js
+
+// Loaders for the precomputed export written by table-to-json.py:
+// small per-page aggregate bundles, and per-object shards fetched on demand.
+const CROWN_DATA_ROOT = 'data';
+const crownObjectCache = new Map();
+
+function loadAggregate(name) {
+    return d3.json(`${CROWN_DATA_ROOT}/aggregates/${name}.json`);
+}
+
+function loadObject(objectId) {
+    if (!crownObjectCache.has(objectId)) {
+        crownObjectCache.set(objectId, d3.json(`${CROWN_DATA_ROOT}/crown_data/objects/${objectId}.json`));
+    }
+    return crownObjectCache.get(objectId);
+}
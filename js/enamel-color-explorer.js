@@ -1,6 +1,5 @@
 // enamel-color-explorer.js
 
-let crownData = [];
 let colorData = [];
 
 document.addEventListener('DOMContentLoaded', function() {
@@ -9,23 +8,17 @@ document.addEventListener('DOMContentLoaded', function() {
 });
 
 function loadData() {
-    d3.json('data/crown_data.json').then(data => {
-        crownData = data;
-        processData();
+    // Colour counts and components are precomputed by table-to-json.py --aggregates
+    loadAggregate('enamel-colors').then(data => {
+        colorData = data;
         createColorChart();
         createDataTable();
     }).catch(error => {
         console.error('Error loading data:', error);
-        alert('Failed to load data. Please check if crown_data.json is available.');
+        alert('Failed to load data. Please check if aggregates/enamel-colors.json is available.');
     });
 }
 
-function processData() {
-    const enamelData = crownData.filter(d => d.Medium === 'Email');
-    const colorCounts = d3.rollup(enamelData, v => v.length, d => d.ObjectName);
-    colorData = Array.from(colorCounts, ([name, value]) => ({name, value}));
-}
-
 function createColorChart() {
     const width = 500;
     const height = 500;
@@ -146,15 +139,12 @@ function showColorDetails(colorData) {
         <h4>${colorData.name}</h4>
         <p>Count: ${colorData.value}</p>
         <p>Percentage: ${(colorData.value / d3.sum(colorData, d => d.value) * 100).toFixed(1)}%</p>
-        <p>Used in components: ${getComponentsForColor(colorData.name)}</p>
+        <p>Used in components: ${getComponentsForColor(colorData)}</p>
     `);
 }
 
-function getComponentsForColor(colorName) {
-    const components = crownData
-        .filter(d => d.Medium === 'Email' && d.ObjectName === colorName)
-        .map(d => d.Bestandteil);
-    return [...new Set(components)].join(", ") || "No components found";
+function getComponentsForColor(colorEntry) {
+    return (colorEntry.components || []).join(", ") || "No components found";
 }
 
 function showTooltip(event, content) {
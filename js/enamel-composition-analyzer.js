@@ -1,6 +1,6 @@
 // enamel-composition-analyzer.js
 
-let crownData = [];
+let enamelSamples = [];
 
 document.addEventListener('DOMContentLoaded', function() {
     console.log('Initializing Enamel Composition Analyzer');
@@ -8,18 +8,18 @@ document.addEventListener('DOMContentLoaded', function() {
 });
 
 function loadData() {
-    d3.json('data/crown_data.json').then(data => {
-        crownData = data;
+    // Only the sample list is loaded up front; each sample is fetched when selected
+    loadAggregate('enamel-samples').then(data => {
+        enamelSamples = data;
         populateEnamelSampleSelect();
         createCompositionChart();
     }).catch(error => {
         console.error('Error loading data:', error);
-        alert('Failed to load data. Please check if crown_data.json is available.');
+        alert('Failed to load data. Please check if aggregates/enamel-samples.json is available.');
     });
 }
 
 function populateEnamelSampleSelect() {
-    const enamelSamples = crownData.filter(d => d.Medium === 'Email');
     const select = d3.select("#enamelSampleSelect");
 
     select.selectAll("option")
@@ -30,9 +30,12 @@ function populateEnamelSampleSelect() {
         .attr("value", d => d.ObjectID);
 
     select.on("change", function() {
-        const selectedSampleId = this.value;
-        updateCompositionChart(selectedSampleId);
-        showSampleDetails(selectedSampleId);
+        loadObject(+this.value).then(sample => {
+            updateCompositionChart(sample);
+            showSampleDetails(sample);
+        }).catch(error => {
+            console.error('Error loading sample:', error);
+        });
     });
 }
 
@@ -66,8 +69,7 @@ function createCompositionChart() {
         .style("font-weight", "bold");
 }
 
-function updateCompositionChart(sampleId) {
-    const sample = crownData.find(d => d.ObjectID === +sampleId);
+function updateCompositionChart(sample) {
     if (!sample || !sample.ConditionAttributes) {
         console.error("No composition data found for this sample");
         return;
@@ -136,8 +138,7 @@ function updateCompositionChart(sampleId) {
     valueLabels.exit().remove();
 }
 
-function showSampleDetails(sampleId) {
-    const sample = crownData.find(d => d.ObjectID === +sampleId);
+function showSampleDetails(sample) {
     if (!sample) {
         console.error("Sample not found");
         return;
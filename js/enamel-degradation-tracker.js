@@ -3,26 +3,28 @@ document.addEventListener('DOMContentLoaded', function() {
     loadData();
 });
 
-let crownData = [];
+let enamelSamples = [];
+let degradationByComponent = [];
 let forsData = [];
 let selectedSample = null;
 
 function loadData() {
     Promise.all([
-        d3.json('data/crown_data.json'),
+        loadAggregate('enamel-degradation'),
         // Assuming FORS data is in a separate file
         d3.json('data/fors_data.json')
-    ]).then(([crown, fors]) => {
-        crownData = crown;
+    ]).then(([degradation, fors]) => {
+        enamelSamples = degradation.samples;
+        degradationByComponent = degradation.by_component;
         forsData = fors;
         populateEnamelSampleSelect();
+        renderDegradationByComponent();
     }).catch(error => {
         console.error('Error loading data:', error);
     });
 }
 
 function populateEnamelSampleSelect() {
-    const enamelSamples = crownData.filter(d => d.Medium === 'Email');
     const select = d3.select("#enamelSampleSelect");
 
     select.selectAll("option")
@@ -141,5 +143,23 @@ function renderChart(data) {
         .text(d => d.Date);
 }
 
+function renderDegradationByComponent() {
+    const container = d3.select("#degradationByComponent");
+    container.html("");
+
+    const rows = container.append("table")
+        .attr("class", "table table-sm")
+        .append("tbody")
+        .selectAll("tr")
+        .data(degradationByComponent)
+        .enter()
+        .append("tr");
+
+    rows.append("th").text(d => d.Bestandteil);
+    rows.append("td").text(d => Object.entries(d.conditions)
+        .map(([condition, count]) => `${condition}: ${count}`)
+        .join(", "));
+}
+
 // Event listener for the update button
 d3.select("#updateChart").on("click", updateChart);
@@ -3,11 +3,11 @@ document.addEventListener('DOMContentLoaded', function() {
     loadData();
 });
 
-let crownData = [];
+let interventionCounts = [];
 
 function loadData() {
-    d3.json('data/crown_data.json').then(data => {
-        crownData = data;
+    loadAggregate('intervention-counts').then(data => {
+        interventionCounts = data;
         renderInterventionMap();
     }).catch(error => {
         console.error('Error loading data:', error);
@@ -25,12 +25,12 @@ function renderInterventionMap() {
     const height = 500;
 
     // Simulate crown components as circles
-    const components = crownData.map((d, i) => ({
+    const components = interventionCounts.map((d, i) => ({
         x: Math.random() * width,
         y: Math.random() * height,
         ObjectID: d.ObjectID,
         Bestandteil: d.Bestandteil,
-        Interventions: d.Interventions || []
+        Interventions: d.Interventions
     }));
 
     svg.selectAll("circle")
@@ -40,18 +40,22 @@ function renderInterventionMap() {
         .attr("cx", d => d.x)
         .attr("cy", d => d.y)
         .attr("r", 20)
-        .attr("fill", d => d.Interventions.length > 0 ? "red" : "green")
+        .attr("fill", d => d.Interventions > 0 ? "red" : "green")
         .on("mouseover", function(event, d) {
             d3.select(this).attr("stroke", "black").attr("stroke-width", 2);
-            showTooltip(event, `${d.Bestandteil}<br>Interventions: ${d.Interventions.length}`);
+            showTooltip(event, `${d.Bestandteil}<br>Interventions: ${d.Interventions}`);
         })
         .on("mouseout", function(event, d) {
             d3.select(this).attr("stroke", "none");
             hideTooltip();
         })
         .on("click", function(event, d) {
-            // Show detailed information
-            alert(`Component: ${d.Bestandteil}\nInterventions: ${d.Interventions.length}`);
+            // Fetch the object's interventions only when they are asked for
+            loadObject(d.ObjectID).then(object => {
+                const surveys = (object.Interventions || [])
+                    .map(intervention => `${intervention.SurveyISODate || ''} ${intervention.SurveyType || ''}`.trim());
+                alert(`Component: ${d.Bestandteil}\nInterventions: ${d.Interventions}\n${surveys.join("\n")}`);
+            });
         });
 }
 
@@ -3,31 +3,15 @@ document.addEventListener('DOMContentLoaded', function() {
     loadData();
 });
 
-let crownData = [];
-
 function loadData() {
-    d3.json('data/crown_data.json').then(data => {
-        crownData = data;
-        processData();
+    // One row per setting type and dating range, precomputed by table-to-json.py --aggregates
+    loadAggregate('setting-type-timeline').then(data => {
+        renderTimeline(data);
     }).catch(error => {
         console.error('Error loading data:', error);
     });
 }
 
-function processData() {
-    // Extract setting types and their dates
-    // Assuming each object has 'SettingType' and 'DateBegin' fields
-    const settingData = crownData.map(d => ({
-        SettingType: d.SettingType || 'Unknown',
-        DateBegin: d.DateBegin || 0,
-        DateEnd: d.DateEnd || 0,
-        ObjectName: d.ObjectName,
-        Bestandteil: d.Bestandteil
-    }));
-
-    renderTimeline(settingData);
-}
-
 function renderTimeline(data) {
     const svg = d3.select("#timelineChart")
         .append("svg")
@@ -74,7 +58,7 @@ function renderTimeline(data) {
         .attr("fill", "steelblue")
         .on("mouseover", function(event, d) {
             d3.select(this).attr("fill", "orange");
-            showTooltip(event, `${d.ObjectName} - ${d.Bestandteil}`);
+            showTooltip(event, `${d.count} objects - ${d.components.join(", ")}`);
         })
         .on("mouseout", function(event, d) {
             d3.select(this).attr("fill", "steelblue");
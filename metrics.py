@@ -0,0 +1,194 @@
+"""Latency and payload metrics for the Dash callbacks.
+
+Every callback registered through CallbackMetrics.instrument(app) is timed.
+Each request to /_dash-update-component is split into:
+
+- compute: the callback function itself, i.e. the pandas work and building
+  the figures;
+- serialize: the rest of the request, mostly Dash encoding the outputs as
+  JSON;
+- the size of the response body.
+
+Histograms of these are served in the Prometheus text format at /metrics.
+Each gunicorn worker keeps its own counts; a scrape reads one worker.
+
+Setting SLOW_CALLBACK_LOG to a file path turns on the slow-callback log:
+PROFILE_SAMPLE_RATE of the calls (default 0.05) run under cProfile, and
+those slower than SLOW_CALLBACK_MS (default 500) have their top functions
+appended to the log.
+"""
+import cProfile
+import functools
+import io
+import os
+import pstats
+import random
+import threading
+import time
+
+from flask import Response, g, has_request_context, request
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1 << 10, 4 << 10, 16 << 10, 64 << 10, 256 << 10, 1 << 20, 4 << 20, 16 << 20)
+
+
+class Histogram:
+    """A labelled Prometheus histogram."""
+
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.setdefault(labels, [[0] * len(self.buckets), 0, 0.0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += 1
+            series[2] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (bucket_counts, count, total) in sorted(self._series.items()):
+                label_text = ','.join(f'{key}="{_escape(value)}"' for key, value in labels)
+                prefix = f"{label_text}," if label_text else ''
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {bucket_count}')
+                lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {count}')
+                lines.append(f"{self.name}_count{{{label_text}}} {count}")
+                lines.append(f"{self.name}_sum{{{label_text}}} {total}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _output_label(outputs):
+    first_output = outputs[0] if isinstance(outputs, (list, tuple)) else outputs
+    return str(first_output.component_id)
+
+
+class InstrumentedApp:
+    """Passes everything through to the Dash app, timing the callbacks it registers."""
+
+    def __init__(self, app, metrics):
+        self._app = app
+        self._metrics = metrics
+
+    def callback(self, *args, **kwargs):
+        register = self._app.callback(*args, **kwargs)
+        output = _output_label(args[0] if args else kwargs['output'])
+
+        def instrumented_register(fn):
+            return register(self._metrics.wrap(fn, output))
+        return instrumented_register
+
+    def __getattr__(self, name):
+        return getattr(self._app, name)
+
+
+class CallbackMetrics:
+    def __init__(self, slow_log=None, slow_ms=500, sample_rate=0.05):
+        self.slow_log = slow_log
+        self.slow_ms = slow_ms
+        self.sample_rate = sample_rate
+        # Only one profiler can be active at a time
+        self._profile_lock = threading.Lock()
+        self.request_seconds = Histogram(
+            'dash_callback_request_seconds', "Wall time of a callback request.", LATENCY_BUCKETS)
+        self.compute_seconds = Histogram(
+            'dash_callback_compute_seconds', "Time inside the callback function (pandas and figure building).",
+            LATENCY_BUCKETS)
+        self.serialize_seconds = Histogram(
+            'dash_callback_serialize_seconds', "Request time outside the callback (output serialisation).",
+            LATENCY_BUCKETS)
+        self.response_bytes = Histogram(
+            'dash_callback_response_bytes', "Size of the callback response body.", SIZE_BUCKETS)
+
+    @classmethod
+    def from_environ(cls):
+        return cls(
+            slow_log=os.environ.get('SLOW_CALLBACK_LOG'),
+            slow_ms=float(os.environ.get('SLOW_CALLBACK_MS', 500)),
+            sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', 0.05))
+        )
+
+    def instrument(self, app):
+        """Return a stand-in for app whose callback decorator times the callbacks."""
+        return InstrumentedApp(app, self)
+
+    def wrap(self, fn, output):
+        labels = (('callback', fn.__name__), ('output', output))
+
+        @functools.wraps(fn)
+        def timed_callback(*args, **kwargs):
+            profiler = self._start_profiler()
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                self.compute_seconds.observe(labels, elapsed)
+                if has_request_context():
+                    g.dash_callback = (labels, elapsed)
+                if profiler:
+                    self._finish_profiler(profiler, labels, elapsed, args)
+        return timed_callback
+
+    def _start_profiler(self):
+        if not self.slow_log or random.random() >= self.sample_rate:
+            return None
+        if not self._profile_lock.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def _finish_profiler(self, profiler, labels, elapsed, args):
+        profiler.disable()
+        self._profile_lock.release()
+        if elapsed * 1000 < self.slow_ms:
+            return
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(25)
+        callback, output = (value for _, value in labels)
+        with open(self.slow_log, 'a', encoding='utf-8') as f:
+            f.write(f"=== {time.strftime('%Y-%m-%d %H:%M:%S')} {callback} -> {output}: {elapsed * 1000:.0f} ms\n")
+            f.write(f"inputs: {args!r:.500}\n")
+            f.write(stream.getvalue())
+
+    def init_app(self, server):
+        """Time callback requests on the Flask server and serve /metrics."""
+        @server.before_request
+        def start_timer():
+            if request.path.endswith('/_dash-update-component'):
+                g.dash_request_start = time.perf_counter()
+
+        @server.after_request
+        def record_request(response):
+            start = g.pop('dash_request_start', None)
+            callback = g.pop('dash_callback', None)
+            if start is None or callback is None:
+                return response
+            labels, compute = callback
+            elapsed = time.perf_counter() - start
+            self.request_seconds.observe(labels, elapsed)
+            self.serialize_seconds.observe(labels, max(elapsed - compute, 0.0))
+            size = response.calculate_content_length()
+            if size is not None:
+                self.response_bytes.observe(labels, size)
+            return response
+
+        @server.route('/metrics')
+        def metrics():
+            return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+    def render(self):
+        histograms = [self.request_seconds, self.compute_seconds, self.serialize_seconds, self.response_bytes]
+        return '\n'.join(line for histogram in histograms for line in histogram.render()) + '\n'
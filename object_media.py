@@ -0,0 +1,60 @@
+"""Restoration records and media files of each object, in CSR layout.
+
+Joining objects -> Restaurierung_1 -> Restaurierung_2 -> Medien gives one
+row per object × condition × line item × media file, so the drill-down
+table repeated objects and every filter scanned the repeats. Instead the
+table keeps one row per object, and the links of the objects live beside
+it in offset arrays: for the object at table position i, its links are
+values[offsets[i]:offsets[i + 1]]. Memory grows with the number of
+objects and links, and a page of the table looks up only its own objects.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+ObjectLinks = namedtuple('ObjectLinks', ['offsets', 'values'])
+
+
+def build_links(object_ids, keys, values):
+    """Group values by the object each key names, for object_ids in order.
+
+    Keys naming no object are dropped, and so are repeated (object, value)
+    pairs; the values of an object keep their input order.
+    """
+    positions = pd.Index(object_ids).get_indexer(keys)
+    pairs = pd.DataFrame({'position': positions, 'value': values})
+    pairs = pairs[pairs['position'] >= 0].drop_duplicates()
+    pairs = pairs.sort_values('position', kind='mergesort')
+    offsets = np.zeros(len(object_ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(pairs['position'], minlength=len(object_ids)), out=offsets[1:])
+    return ObjectLinks(offsets=offsets, values=pairs['value'].to_numpy())
+
+
+def links_of(links, position):
+    """The links of the object at a table position."""
+    return links.values[links.offsets[position]:links.offsets[position + 1]]
+
+
+def link_counts(links):
+    """Number of links of every object, in table order."""
+    return np.diff(links.offsets)
+
+
+def build_restoration_links(object_ids, restaurierung_1_df):
+    """Row positions in restaurierung_1_df of every object's restoration records."""
+    return build_links(object_ids, restaurierung_1_df['ID'].to_numpy(), np.arange(len(restaurierung_1_df)))
+
+
+def build_media_links(object_ids, restaurierung_1_df, restaurierung_2_df, paths_df):
+    """File names of the media of every object's restoration line items.
+
+    The restoration tables are joined among themselves, which gives one row
+    per media file of an object, never a row per combination with the
+    object's other records.
+    """
+    conditions = restaurierung_1_df[['ID', 'ConditionID']].dropna()
+    line_items = restaurierung_2_df[['ConditionID', 'CondLineItemID']].dropna()
+    files = paths_df[['CondLineItemID', 'FileName']].dropna()
+    media = conditions.merge(line_items, on='ConditionID').merge(files, on='CondLineItemID')
+    return build_links(object_ids, media['ID'].to_numpy(), media['FileName'].astype(object).to_numpy())
@@ -0,0 +1,400 @@
+"""Pre-rendered dashboard: every view written once as JSON, served without pandas.
+
+    python prerender.py build [--output prerendered]   # render the current data snapshot
+    gunicorn "prerender:create_server()"                # serve the newest build
+
+The build imports app, loads the workbooks and writes one directory per
+data version:
+
+    prerendered/<version>/pages/<page>.json.gz      page layouts with their figures
+    prerendered/<version>/figures/home.json.gz      home chart, every category
+    prerendered/<version>/data/medium_counts.json.gz
+    prerendered/<version>/tables/<table>/<key>.json.gz
+    prerendered/<version>/manifest.json
+    prerendered/current                            name of the newest build
+
+A table file holds every row listed for one chart click: each medium type
+on the home page, each colour, each damage segment (component and
+condition) and each sunburst node. <key> is selection_key() of the
+selection the chart stores. 'current' is replaced only after a build is
+complete, and the server switches to the new build on the next request.
+
+The server answers the same callbacks as app.py from these files. Tables
+page and sort in Python; their filter row is left out. Colour and damage
+queries combining several values, the text search and the cross filter
+need the live dashboard and say so. Everything is plain files, so the directory can also
+be put behind a CDN.
+"""
+import argparse
+import functools
+import gzip
+import hashlib
+import json
+import os
+import sys
+import time
+
+import dash
+from dash import dcc, html
+from dash.dependencies import Input, Output
+
+from clientside_callbacks import register_clientside_callbacks
+from http_cache import compress, init_compression
+from metrics import CallbackMetrics
+from static_data import feature_families
+
+PRERENDER_DIR = os.environ.get('CROWN_PRERENDER_DIR', 'prerendered')
+POINTER = 'current'
+
+# Pathname -> page file
+PAGES = {
+    '/': 'home',
+    '/colors': 'colors',
+    '/damage': 'damage',
+    '/sunburst': 'sunburst',
+    '/pearls-gemstones': 'pearls-gemstones',
+    '/search': 'search',
+    '/cross-filter': 'cross-filter',
+}
+
+TABLE_IDS = ['object-table', 'color-object-table', 'damage-object-table', 'sunburst-table']
+
+MATCH_ALL = 'all'  # damage_index.MATCH_ALL, without importing pandas
+
+
+def selection_key(selection):
+    """File name stem of a table selection (a string or a dict of lists)."""
+    canonical = json.dumps(selection, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:16]
+
+
+def color_selection(color):
+    return {'all_of': [color], 'any_of': [], 'none_of': []}
+
+
+def damage_selection(component, condition):
+    return {'components': [component], 'conditions': [condition], 'match': MATCH_ALL}
+
+
+# Build
+
+def _write_json(path, value, encoder=None):
+    """Write value as gzip-compressed JSON, replacing path atomically."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    body = json.dumps(value, cls=encoder, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    with open(path + '.tmp', 'wb') as f:
+        f.write(compress(body, 'gzip', level=9))
+    os.replace(path + '.tmp', path)
+    return len(body)
+
+
+def _without_filter_row(node):
+    """Switch off the filter row of every DataTable in a serialized layout."""
+    if isinstance(node, dict):
+        if node.get('type') == 'DataTable' and node.get('props', {}).get('filter_action') == 'custom':
+            node['props']['filter_action'] = 'none'
+        for value in node.values():
+            _without_filter_row(value)
+    elif isinstance(node, list):
+        for value in node:
+            _without_filter_row(value)
+    return node
+
+
+def table_selections(snapshot):
+    """Every selection a chart click can store, per table id."""
+    damage_counts = snapshot.filtered_damage_counts
+    damage_conditions = damage_counts.columns[1:]
+    return {
+        'object-table': snapshot.medium_counts['Medium_Type'].tolist(),
+        'color-object-table': [color_selection(color) for color in snapshot.color_counts_presence['Enamel Color']],
+        'damage-object-table': [
+            damage_selection(component, condition)
+            for component, counts in zip(damage_counts['Bestandteil'], damage_counts[damage_conditions].to_numpy())
+            for condition, count in zip(damage_conditions, counts) if count > 0
+        ],
+        'sunburst-table': list(snapshot.sunburst_index),
+    }
+
+
+def build(output):
+    """Pre-render the current data snapshot into output/<version>; return the build directory."""
+    from plotly.utils import PlotlyJSONEncoder
+
+    import app
+
+    start = time.perf_counter()
+    snapshot = app.snapshots.current().warm()
+    version = snapshot.version
+    target = os.path.join(output, version)
+    staging = target + '.partial'
+    manifest = {'version': version, 'pages': {}, 'tables': {}}
+
+    def write(relative_path, value):
+        return _write_json(os.path.join(staging, relative_path), value, PlotlyJSONEncoder)
+
+    for pathname, page in PAGES.items():
+        layout = json.loads(json.dumps(app.PAGE_LAYOUTS[pathname](), cls=PlotlyJSONEncoder))
+        manifest['pages'][pathname] = write(f'pages/{page}.json.gz', _without_filter_row(layout))
+    write('figures/home.json.gz', app.medium_figure(snapshot, tuple(snapshot.medium_counts['Category'].unique())))
+    write('figures/home-empty.json.gz', app.medium_figure(snapshot, ()))
+    write('data/medium_counts.json.gz', snapshot.medium_counts.to_dict('records'))
+
+    for table_id, selections in table_selections(snapshot).items():
+        for selection in selections:
+            rows = app.query_table(snapshot, table_id, app.hashable_selection(selection))
+            write(f'tables/{table_id}/{selection_key(selection)}.json.gz', {
+                'selection': selection,
+                'rows': app.table_records(snapshot, rows),
+            })
+        manifest['tables'][table_id] = len(selections)
+
+    manifest['seconds'] = round(time.perf_counter() - start, 2)
+    with open(os.path.join(staging, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    if os.path.exists(target):
+        import shutil
+        shutil.rmtree(target)
+    os.replace(staging, target)
+
+    # Point the servers at the new build only once it is complete
+    pointer = os.path.join(output, POINTER)
+    with open(pointer + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(pointer + '.tmp', pointer)
+    return target
+
+
+# Serve
+
+@functools.lru_cache(maxsize=256)
+def _read_json(path):
+    with gzip.open(path, 'rb') as f:
+        return json.loads(f.read())
+
+
+class PrerenderedViews:
+    """Reads the files of the newest build under root."""
+
+    def __init__(self, root):
+        self.root = root
+        self._pointer_mtime = None
+        self._build_dir = None
+
+    def build_dir(self):
+        # Re-read the pointer only when a build has replaced it
+        pointer = os.path.join(self.root, POINTER)
+        mtime = os.stat(pointer).st_mtime_ns
+        if mtime != self._pointer_mtime:
+            with open(pointer, 'r', encoding='utf-8') as f:
+                self._build_dir = os.path.join(self.root, f.read().strip())
+            self._pointer_mtime = mtime
+        return self._build_dir
+
+    def read(self, relative_path):
+        """The contents of a file of the current build, or None if it was not pre-rendered."""
+        path = os.path.join(self.build_dir(), relative_path)
+        if not os.path.exists(path):
+            return None
+        return _read_json(path)
+
+    def page(self, pathname):
+        return self.read(f"pages/{PAGES.get(pathname, 'home')}.json.gz")
+
+    def table_rows(self, table_id, selection):
+        table = self.read(f'tables/{table_id}/{selection_key(selection)}.json.gz')
+        return None if table is None else table['rows']
+
+
+def sort_rows(rows, sort_by):
+    """Sort table records like table_query.sort_frame: numbers by value, other values by text, empty cells last."""
+    columns = set(rows[0]) if rows else set()
+    rows = list(rows)
+    # Sort by the last key first; Python's sort is stable, also in reverse
+    for s in reversed([s for s in (sort_by or []) if s['column_id'] in columns]):
+        column = s['column_id']
+        filled = [row for row in rows if row[column] is not None]
+        empty = [row for row in rows if row[column] is None]
+        numeric = all(isinstance(row[column], (int, float)) and not isinstance(row[column], bool) for row in filled)
+        key = (lambda row: row[column]) if numeric else (lambda row: str(row[column]))
+        rows = sorted(filled, key=key, reverse=s['direction'] == 'desc') + empty
+    return rows
+
+
+def register_static_callbacks(app, views):
+    """The callbacks of app.register_callbacks, answered from the pre-rendered files."""
+    @app.callback(
+        Output('page-content', 'children'),
+        [Input('url', 'pathname')]
+    )
+    def display_page(pathname):
+        return views.page(pathname)
+
+    @app.callback(
+        Output('object-distribution-chart', 'figure'),
+        [Input('category-dropdown', 'value')]
+    )
+    def update_medium_chart(selected_categories):
+        if not selected_categories:
+            return views.read('figures/home-empty.json.gz')
+        figure = views.read('figures/home.json.gz')
+        # One trace per category
+        return dict(figure, data=[trace for trace in figure['data'] if trace.get('name') in selected_categories])
+
+    @app.callback(
+        [Output('summary-stats', 'children'),
+         Output('click-data', 'children'),
+         Output('object-table-selection', 'data'),
+         Output('object-table', 'page_current')],
+        [Input('category-dropdown', 'value'),
+         Input('object-distribution-chart', 'clickData')]
+    )
+    def update_medium_summary(selected_categories, click_data):
+        medium_counts = views.read('data/medium_counts.json.gz')
+        filtered_data = [row for row in medium_counts if row['Category'] in (selected_categories or [])]
+        if not filtered_data:
+            summary = html.Div([
+                html.P("No object types found for the selected categories."),
+                html.P("Please select different categories.")
+            ])
+            return summary, "No data", None, 0
+
+        if click_data:
+            clicked_object = click_data['points'][0]['x']
+            details = next(row for row in medium_counts if row['Medium_Type'] == clicked_object)
+            details_text = html.Div([
+                html.P(f"Details for {clicked_object}:"),
+                html.P(f"Count: {details['Count']}"),
+                html.P(f"Category: {details['Category']}")
+            ])
+            return details_text, f"You clicked on: {clicked_object}", clicked_object, 0
+
+        most_common = max(filtered_data, key=lambda row: row['Count'])['Medium_Type']
+        summary = html.Div([
+            html.P(f"Total object instances: {sum(row['Count'] for row in filtered_data)}"),
+            html.P(f"Most common object type: {most_common}"),
+            html.P(f"Number of object types: {len(filtered_data)}")
+        ])
+        return summary, "No data", None, 0
+
+    @app.callback(
+        [Output('color-object-table-selection', 'data'),
+         Output('color-object-table', 'page_current'),
+         Output('color-query-summary', 'children')],
+        [Input('color-all-of', 'value'),
+         Input('color-any-of', 'value'),
+         Input('color-none-of', 'value')]
+    )
+    def update_color_query(all_of, any_of, none_of):
+        if not (all_of or any_of or none_of):
+            return None, 0, "Click a colour or choose colours above to list objects."
+        selection = {'all_of': sorted(all_of or []), 'any_of': sorted(any_of or []), 'none_of': sorted(none_of or [])}
+        rows = views.table_rows('color-object-table', selection)
+        if rows is None:
+            return None, 0, "Only single colours are available here; combined colour queries need the live dashboard."
+        return selection, 0, f"{len(rows)} objects match the colour query."
+
+    @app.callback(
+        [Output('damage-object-table-selection', 'data'),
+         Output('damage-object-table', 'page_current'),
+         Output('damage-query-summary', 'children')],
+        [Input('damage-components', 'value'),
+         Input('damage-conditions', 'value'),
+         Input('damage-match', 'value')]
+    )
+    def update_damage_query(components, conditions, match):
+        if not conditions:
+            return None, 0, "Click a bar segment or choose damage conditions above to list objects."
+        # With one condition, 'all' and 'any' select the same objects
+        selection = {'components': sorted(components or []), 'conditions': sorted(conditions),
+                     'match': MATCH_ALL if len(conditions) == 1 else match}
+        rows = views.table_rows('damage-object-table', selection)
+        if rows is None:
+            return None, 0, "Only single bar segments are available here; other damage queries need the live dashboard."
+        return selection, 0, f"{len(rows)} objects match the damage query."
+
+    @app.callback(
+        [Output('search-table-selection', 'data'),
+         Output('search-table', 'page_current'),
+         Output('search-summary', 'children')],
+        [Input('search-query', 'value')]
+    )
+    def update_search(query):
+        return None, 0, "Text search needs the live dashboard."
+
+    @app.callback(
+        [Output('cross-filter-table-selection', 'data'),
+         Output('cross-filter-table', 'page_current'),
+         Output('cross-filter-summary', 'children'),
+         Output('cross-filter-chart', 'figure')]
+        + [Output(f'cross-filter-{family}', 'options') for family in feature_families],
+        [Input(f'cross-filter-{family}', 'value') for family in feature_families]
+        + [Input('cross-filter-family', 'value')]
+    )
+    def update_cross_filter(*values):
+        return [None, 0, "The cross filter needs the live dashboard."] + [dash.no_update] * (1 + len(feature_families))
+
+    register_clientside_callbacks(app)
+
+    for table_id in TABLE_IDS + ['search-table', 'cross-filter-table']:
+        register_static_table_callback(app, views, table_id)
+
+
+def register_static_table_callback(app, views, table_id):
+    """Serve one page of a pre-rendered object table, sorted on request."""
+    @app.callback(
+        [Output(table_id, 'data'),
+         Output(table_id, 'page_count'),
+         Output(f'{table_id}-row-count', 'children')],
+        [Input(f'{table_id}-selection', 'data'),
+         Input(table_id, 'page_current'),
+         Input(table_id, 'page_size'),
+         Input(table_id, 'sort_by'),
+         Input(table_id, 'filter_query')]
+    )
+    def update_object_table(selection, page_current, page_size, sort_by, filter_query):
+        rows = views.table_rows(table_id, selection) if selection is not None else None
+        rows = sort_rows(rows or [], sort_by)
+        start = (page_current or 0) * page_size
+        page_count = max(1, -(-len(rows) // page_size))
+        return rows[start:start + page_size], page_count, f"{len(rows)} matching rows"
+
+
+def create_static_app(root=PRERENDER_DIR):
+    """Create the Dash app serving the pre-rendered build under root."""
+    app = dash.Dash(__name__, suppress_callback_exceptions=True)
+    app.layout = html.Div([
+        dcc.Location(id='url', refresh=False),
+        html.Div(id='page-content')
+    ])
+
+    callback_metrics = CallbackMetrics.from_environ()
+    callback_metrics.init_app(app.server)
+    register_static_callbacks(callback_metrics.instrument(app), PrerenderedViews(root))
+    init_compression(app.server)
+    return app
+
+
+def create_server(root=PRERENDER_DIR):
+    """The Flask server of create_static_app, for gunicorn "prerender:create_server()"."""
+    return create_static_app(root).server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-render the CROWN dashboard, or serve a pre-rendered build.")
+    parser.add_argument('command', choices=['build', 'serve'])
+    parser.add_argument('--output', default=PRERENDER_DIR, help="build directory (default: prerendered/)")
+    parser.add_argument('--port', type=int, default=8050)
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        target = build(args.output)
+        print(f"Pre-rendered into {target} in {time.perf_counter() - start:.1f}s")
+    else:
+        create_static_app(args.output).run(port=args.port)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
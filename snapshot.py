@@ -0,0 +1,105 @@
+"""Hot reload of the preprocessed dashboard data.
+
+The dashboard serves every request from one immutable data snapshot. A
+SnapshotManager polls the source workbooks and, when one changes, builds a
+new snapshot in a background thread while requests keep using the old one.
+The finished snapshot replaces the old one with a single reference
+assignment. A callback reads current() once and works with that snapshot
+throughout, so it never sees a mix of old and new data.
+
+Under gunicorn the master process watches the files instead and reloads
+once for all workers (see gunicorn.conf.py).
+"""
+import glob
+import os
+import threading
+import time
+import traceback
+
+
+class SnapshotManager:
+    """Hold the current data snapshot and rebuild it when the watched files change."""
+
+    def __init__(self, build, pattern, interval=30, on_swap=None, prepare=None):
+        self._build = build
+        self._pattern = pattern
+        self.interval = interval
+        self._on_swap = on_swap
+        self._prepare = prepare
+        self._reload_lock = threading.Lock()
+        self._thread = None
+        self._on_change = None
+        self._signature = self._scan()
+        self._snapshot = build()
+
+    def current(self):
+        """Return the current snapshot."""
+        return self._snapshot
+
+    def _scan(self):
+        signature = []
+        for path in sorted(glob.glob(self._pattern)):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            signature.append((path, stat.st_size, stat.st_mtime_ns))
+        return tuple(signature)
+
+    def reload(self):
+        """Build a new snapshot from the current files and swap it in."""
+        with self._reload_lock:
+            signature = self._scan()
+            start = time.perf_counter()
+            snapshot = self._build()
+            # Do the expensive work before the swap, not in the first request after it
+            if self._prepare:
+                self._prepare(snapshot)
+            self._signature = signature
+            self.swap(snapshot)
+            print(f"Data snapshot reloaded in {time.perf_counter() - start:.2f}s")
+            return snapshot
+
+    def swap(self, snapshot):
+        """Make snapshot the current one."""
+        self._snapshot = snapshot
+        if self._on_swap:
+            self._on_swap(snapshot)
+
+    def start(self, on_change=None):
+        """Start watching the files in a daemon thread; does nothing if interval is 0.
+
+        When the files change, the thread reloads, or calls on_change instead
+        if given, which must then arrange for reload() to be called.
+        """
+        if self.interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._on_change = on_change
+        self._thread = threading.Thread(target=self._watch, name='snapshot-watcher', daemon=True)
+        self._thread.start()
+
+    def _watch(self):
+        pending = None
+        while True:
+            time.sleep(self.interval)
+            signature = self._scan()
+            if signature == self._signature:
+                pending = None
+                continue
+            # Wait until the files stop changing, so a copy in progress is not read
+            if signature != pending:
+                pending = signature
+                continue
+            if self._on_change is not None:
+                self._signature = signature
+                self._on_change()
+                pending = None
+                continue
+            try:
+                self.reload()
+            except Exception:
+                # Keep serving the previous snapshot; retry once the files change again
+                print("Data snapshot reload failed:")
+                traceback.print_exc()
+                self._signature = signature
+            pending = None
@@ -125,4 +125,21 @@ settings_columns = {
         'Röhrchen: Abstand zwischen Röhrchen', 'Röhrchen: Anzahl', 'Röhrchen: Blechstärke', 'Röhrchen: Durchmesser',
         'Röhrchen: Höhe', 'Röhrchen: Sonstiges', 'Technischer Aufbau: Sonstiges'
     ]
-}
\ No newline at end of file
+}
+# Userfields columns of the pearls and gemstones page
+drill_holes_column = 'Bohrloch: Anzahl'
+non_fitting_columns = ['Form: Sonstiges', 'Form: Stein in Fassung', 'Form für Fassung']
+cut_forms_columns = ['Form: Schliff', 'Form: Schliff: Beschreibung']
+pearl_columns = [
+    'Form', 'Form: Sonstiges', 'Oberfläche', 'Perlmutterstruktur: Beschreibung', 'fehlende Teile',
+    'fehlende Teile: Beschreibung', 'Kratzer', 'Kratzer: Beschreibung', 'Riss', 'Riss: Beschreibung'
+]
+
+# Feature families of the cross-filter page (see feature_matrix.py) and their labels
+feature_families = {
+    'medium': 'Medium',
+    'component': 'Component',
+    'colour': 'Enamel colour',
+    'damage': 'Damage condition',
+    'setting': 'Setting',
+}
@@ -1,39 +1,67 @@
 import pandas as pd
-import plotly.express as px
 
 def load_sunburst_data(userfields_df):
     """Load and preprocess data for the sunburst chart."""
     from static_data import settings_columns
 
-    # Consolidate data for sunburst chart
-    sunburst_data = {
-        'SettingType': [],
-        'Component': [],
-        'Attribute': [],
-        'Value': [],
-        'Count': []
-    }
-
-    def process_setting(setting_name, columns):
-        available_columns = [col for col in columns if col in userfields_df.columns]
-        df_setting = userfields_df[available_columns]
-        for column in available_columns:
-            value_counts = df_setting[column].value_counts()
-            for value, count in value_counts.items():
-                if not pd.isna(value):
-                    sunburst_data['SettingType'].append(setting_name)
-                    sunburst_data['Component'].append(column.split(':')[0])
-                    sunburst_data['Attribute'].append(column)
-                    sunburst_data['Value'].append(value)
-                    sunburst_data['Count'].append(count)
+    # One row per (setting, attribute column); a column may serve several settings
+    setting_columns = pd.DataFrame(
+        [(setting, col) for setting, columns in settings_columns.items() for col in columns if col in userfields_df.columns],
+        columns=['SettingType', 'Attribute']
+    )
+
+    # Count every value of every settings column in a single pass
+    long_df = userfields_df[setting_columns['Attribute'].unique()].melt(var_name='Attribute', value_name='Value')
+    long_df = long_df.dropna(subset=['Value'])
+    value_counts = long_df.groupby(['Attribute', 'Value'], sort=False).size().reset_index(name='Count')
+
+    # Keep the settings order of static_data, most frequent values first
+    sunburst_data = setting_columns.rename_axis('Order').reset_index().merge(value_counts, on='Attribute', how='inner')
+    sunburst_data = sunburst_data.sort_values(['Order', 'Count'], ascending=[True, False], kind='mergesort')
+    sunburst_data['Component'] = sunburst_data['Attribute'].str.split(':').str[0]
+    return sunburst_data[['SettingType', 'Component', 'Attribute', 'Value', 'Count']].reset_index(drop=True)
+
+def build_value_index(userfields_df, columns):
+    """Build an inverted index mapping (attribute column, value) to object IDs."""
+    long_df = userfields_df.melt(id_vars='ID', value_vars=columns, var_name='Attribute', value_name='Value')
+    long_df = long_df.dropna(subset=['Value'])
+    # The sunburst labels its nodes with the string form of each value
+    long_df['Value'] = long_df['Value'].astype(str)
+    return {key: frozenset(ids) for key, ids in long_df.groupby(['Attribute', 'Value'])['ID']}
+
+def build_sunburst_index(userfields_df):
+    """Map every sunburst node id to the set of object IDs below that node."""
+    from static_data import settings_columns
 
+    all_columns = list(dict.fromkeys(
+        col for columns in settings_columns.values() for col in columns if col in userfields_df.columns
+    ))
+    value_index = build_value_index(userfields_df, all_columns)
+
+    values_by_column = {}
+    for (column, value), ids in value_index.items():
+        values_by_column.setdefault(column, []).append((value, ids))
+
+    # Node ids follow px.sunburst: SettingType/Component/Attribute/Value
+    node_index = {}
     for setting, columns in settings_columns.items():
-        process_setting(setting, columns)
+        for column in columns:
+            component_id = f"{setting}/{column.split(':')[0]}"
+            attribute_id = f"{component_id}/{column}"
+            for value, ids in values_by_column.get(column, []):
+                for node_id in (setting, component_id, attribute_id, f"{attribute_id}/{value}"):
+                    node_index.setdefault(node_id, set()).update(ids)
+
+    return {node_id: frozenset(ids) for node_id, ids in node_index.items()}
 
-    return pd.DataFrame(sunburst_data)
+def create_sunburst_chart(df_sunburst):
+    """Create the sunburst chart.
+
+    The clicked node is highlighted in the browser (see clientside_callbacks.py).
+    """
+    # plotly.express is imported on first use to keep worker start-up fast
+    import plotly.express as px
 
-def create_sunburst_chart(df_sunburst, selected_path=None):
-    """Create the sunburst chart."""
     fig = px.sunburst(
         df_sunburst,
         width=1800,
@@ -76,13 +104,6 @@ def create_sunburst_chart(df_sunburst, selected_path=None):
         textfont=dict(size=10),
     )
 
-    if selected_path:
-        fig.update_traces(
-            insidetextfont=dict(color='white', size=10),
-            marker=dict(line=dict(color='black', width=2)),
-            selector=dict(customdata=selected_path)
-        )
-
     legend_items = [
         ('Claw setting', '#FF6347'),
         ('Setting with three pearls', '#4682B4'),
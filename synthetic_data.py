@@ -0,0 +1,205 @@
+"""Synthetic CROWN exports at a configurable scale.
+
+The generator profiles the nine workbooks in a template directory (the
+public export in data/) and writes new workbooks with scale times as many
+objects:
+
+- Every column keeps its fill rate and its distribution of values.
+- Child tables keep their distribution of rows per parent.
+- The key relationships hold:
+  - ObjectID is the ID in userfields, the text entries, the alternative
+    numbers and Restaurierung_1;
+  - ObjectNumber is copied into Restaurierung_1;
+  - ConditionID links Restaurierung_1 to Restaurierung_2;
+  - CondLineItemID links Restaurierung_2 to Restaurierung_3_Medien.
+- Medium values are recombined from the ';'-separated tokens of the
+  template.
+- The userfields workbook has every colour, damage and settings column
+  listed in static_data.py.
+
+    python synthetic_data.py --scale 10 --output data-synthetic
+    python synthetic_data.py --scale 100 --output data-synthetic --format xlsx
+
+The default 'cache' format writes each workbook with its header row only and
+stores its rows in the workbook cache (see data_cache.py), which the
+dashboard and the exporter read directly. Such workbooks are marked, and
+reading one whose cache entry is gone (cache deleted, pandas upgraded)
+raises instead of giving empty frames; generate the data again then:
+
+    CROWN_DATA_DIR=data-synthetic python app.py
+    python table-to-json.py --data-dir data-synthetic
+    python benchmark.py --data-dir data-synthetic
+
+Writing full xlsx files takes minutes at large scales, because userfields
+has several hundred columns.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_cache import CACHE_ONLY_TITLE, read_excel_cached, store_cached
+from static_data import color_columns, damage_columns, settings_columns
+
+WORKBOOKS = {
+    'objects': 'CROWN_Objects_1_2024_02_02.xlsx',
+    'text_entries': 'CROWN_Objects_3_TextEntries_2024_02_02.xlsx',
+    'alt_numbers': 'CROWN_Objects_4_AltNumbers_2024_02_02.xlsx',
+    'constituents': 'CROWN_Objects_5_Constituents_2024_02_02.xlsx',
+    'objects_medien': 'CROWN_Objects_6_Medien_2024_02_02.xlsx',
+    'restaurierung_1': 'CROWN_Restaurierung_1_2024_02_02.xlsx',
+    'restaurierung_2': 'CROWN_Restaurierung_2_2024_02_02.xlsx',
+    'restaurierung_3_medien': 'CROWN_Restaurierung_3_Medien_2024_02_02.xlsx',
+    'userfields': 'crown-userfields.xlsx',
+}
+
+# Child tables in generation order: (table, foreign key, parent table, parent key, own unique key)
+RELATIONS = [
+    ('userfields', 'ID', 'objects', 'ObjectID', None),
+    ('text_entries', 'ID', 'objects', 'ObjectID', None),
+    ('alt_numbers', 'ID', 'objects', 'ObjectID', None),
+    ('constituents', 'ObjectID', 'objects', 'ObjectID', None),
+    ('objects_medien', 'ObjectID', 'objects', 'ObjectID', 'MediaMasterID'),
+    ('restaurierung_1', 'ID', 'objects', 'ObjectID', 'ConditionID'),
+    ('restaurierung_2', 'ConditionID', 'restaurierung_1', 'ConditionID', 'CondLineItemID'),
+    ('restaurierung_3_medien', 'CondLineItemID', 'restaurierung_2', 'CondLineItemID', 'MediaMasterID'),
+]
+
+
+def load_template(template_dir):
+    """Read the nine template workbooks."""
+    cache_dir = os.path.join(template_dir, '.cache')
+    return {name: read_excel_cached(os.path.join(template_dir, file_name), cache_dir)
+            for name, file_name in WORKBOOKS.items()}
+
+
+def sample_column(column, n, rng):
+    """Draw n values with the fill rate and value distribution of a template column."""
+    values = column.dropna().to_numpy()
+    if len(values) == 0:
+        return pd.Series([np.nan] * n, dtype=column.dtype)
+    sampled = pd.Series(values[rng.integers(0, len(values), n)])
+    fill_rate = len(values) / len(column)
+    if fill_rate < 1:
+        sampled = sampled.where(rng.random(n) < fill_rate)
+    return sampled
+
+
+def sample_frame(template, n, rng, skip=()):
+    """Sample every column of template except skip into a frame of n rows."""
+    return pd.DataFrame({col: sample_column(template[col], n, rng) for col in template.columns if col not in skip})
+
+
+def sample_medium(column, n, rng):
+    """Recombine the ';'-separated Medium tokens of the template into n new values."""
+    tokens = column.dropna().str.split(';').map(lambda parts: [p.strip() for p in parts if p.strip()])
+    token_pool = np.array([token for parts in tokens for token in parts], dtype=object)
+    token_counts = tokens.map(len).to_numpy()
+    fill_rate = len(tokens) / len(column)
+
+    media = []
+    for count in token_counts[rng.integers(0, len(token_counts), n)]:
+        picked = token_pool[rng.integers(0, len(token_pool), count)]
+        media.append('; '.join(dict.fromkeys(picked)))
+    return pd.Series(media, dtype=object).where(rng.random(n) < fill_rate)
+
+
+def children_per_parent(child, foreign_key, parent, parent_key):
+    """The template's number of child rows for every parent row (0 included)."""
+    counts = child[foreign_key].value_counts()
+    return parent[parent_key].map(counts).fillna(0).astype(int).to_numpy()
+
+
+def new_ids(template_column, n):
+    """n unique integer keys in the range of the template's keys."""
+    start = int(template_column.min()) if len(template_column) else 1
+    return np.arange(start, start + n, dtype=np.int64)
+
+
+def generate_objects(template, n, rng):
+    objects = sample_frame(template, n, rng, skip=('ObjectID', 'ObjectNumber', 'Medium'))
+    objects.insert(0, 'ObjectID', new_ids(template['ObjectID'], n))
+    numbers = template['ObjectNumber'].dropna().to_numpy()
+    objects.insert(1, 'ObjectNumber', [f"{numbers[i]}_S{k}" for k, i in enumerate(rng.integers(0, len(numbers), n))])
+    objects['Medium'] = sample_medium(template['Medium'], n, rng)
+    return objects[template.columns]
+
+
+def generate_child(template, parent, parent_template, foreign_key, parent_key, unique_key, rng):
+    """Generate a child table whose rows per parent follow the template's distribution."""
+    counts = children_per_parent(template, foreign_key, parent_template, parent_key)
+    per_parent = counts[rng.integers(0, len(counts), len(parent))]
+    parent_rows = np.repeat(np.arange(len(parent)), per_parent)
+    n = len(parent_rows)
+
+    skip = {foreign_key, unique_key}
+    if 'ObjectNumber' in template.columns and 'ObjectNumber' in parent.columns:
+        skip.add('ObjectNumber')
+    child = sample_frame(template, n, rng, skip=skip)
+    child[foreign_key] = parent[parent_key].to_numpy()[parent_rows]
+    if unique_key:
+        child[unique_key] = new_ids(template[unique_key], n)
+    if 'ObjectNumber' in skip:
+        child['ObjectNumber'] = parent['ObjectNumber'].to_numpy()[parent_rows]
+    return child[template.columns]
+
+
+def add_static_columns(userfields):
+    """Add the static_data.py userfield columns missing from the template, left empty."""
+    expected = color_columns + damage_columns + [col for columns in settings_columns.values() for col in columns]
+    missing = [col for col in dict.fromkeys(expected) if col not in userfields.columns]
+    if missing:
+        userfields = pd.concat([userfields, pd.DataFrame(np.nan, index=userfields.index, columns=missing)], axis=1)
+    return userfields
+
+
+def generate_tables(template, scale, seed=0):
+    """Return {table name: DataFrame} for a dataset with scale times the template's objects."""
+    rng = np.random.default_rng(seed)
+    tables = {'objects': generate_objects(template['objects'], int(round(len(template['objects']) * scale)), rng)}
+    for name, foreign_key, parent_name, parent_key, unique_key in RELATIONS:
+        tables[name] = generate_child(
+            template[name], tables[parent_name], template[parent_name], foreign_key, parent_key, unique_key, rng
+        )
+    tables['userfields'] = add_static_columns(tables['userfields'])
+    return tables
+
+
+def write_tables(tables, output_dir, file_format='cache'):
+    """Write the tables as workbooks, or as header-only workbooks plus cache entries."""
+    os.makedirs(output_dir, exist_ok=True)
+    cache_dir = os.path.join(output_dir, '.cache')
+    for name, df in tables.items():
+        start = time.perf_counter()
+        path = os.path.join(output_dir, WORKBOOKS[name])
+        if file_format == 'xlsx':
+            df.to_excel(path, index=False)
+            read_excel_cached(path, cache_dir)
+        else:
+            with pd.ExcelWriter(path) as writer:
+                df.iloc[0:0].to_excel(writer, index=False)
+                # Marked, so reading it without its cache entry fails instead of giving no rows
+                writer.book.properties.title = CACHE_ONLY_TITLE
+            store_cached(path, df, cache_dir)
+        print(f"{path}: {df.shape[0]} rows x {df.shape[1]} columns written in {time.perf_counter() - start:.2f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic CROWN dataset.")
+    parser.add_argument('--scale', type=float, default=10, help="number of objects relative to the template")
+    parser.add_argument('--output', default='data-synthetic')
+    parser.add_argument('--format', choices=['cache', 'xlsx'], default='cache')
+    parser.add_argument('--template', default='data', help="directory with the template workbooks")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    tables = generate_tables(load_template(args.template), args.scale, args.seed)
+    write_tables(tables, args.output, args.format)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,18 +1,42 @@
-import pandas as pd
+"""Export the CROWN workbooks as nested per-object JSON documents.
+
+    python table-to-json.py                         # data/crown_data.json (one array)
+    python table-to-json.py --format ndjson         # data/crown_data.ndjson (one object per line)
+    python table-to-json.py --format shards         # data/crown_data/objects/<ObjectID>.json + index.json
+
+The output goes to the data directory (--data-dir), which the dashboard
+serves at /data/. The static D3 pages, served at /explorer/, read the
+shards and the per-page aggregate bundles:
+
+    python table-to-json.py --format shards --aggregates data/aggregates --precompress
+
+--precompress writes .gz (and, with the brotli package, .br) copies next
+to every file, which the dashboard server sends to browsers that accept
+them (see http_cache.py).
+
+Objects are written as they are built and each one is validated on its own,
+so output memory stays flat regardless of the collection size.
+"""
+import argparse
 import json
 import math
+import os
+import sys
+import textwrap
 from pandas import Timestamp
 
-def validate_json_file(file_path):
-    try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            json.load(file)
-        print(f"The file {file_path} contains valid JSON.")
-        return True
-    except json.JSONDecodeError as e:
-        print(f"The file {file_path} contains invalid JSON.")
-        print(f"Error: {str(e)}")
-        return False
+from data_cache import DATA_DIR, read_excel_cached
+from export_aggregates import write_page_aggregates
+from http_cache import precompress
+
+def _reject_constant(name):
+    raise ValueError(f"{name} is not valid JSON")
+
+# Serialize one document and check that it parses back as strict JSON (no NaN/Infinity)
+def dumps_validated(document, **kwargs):
+    text = json.dumps(document, default=custom_json_serializer, sort_keys=True, ensure_ascii=False, **kwargs)
+    json.loads(text, parse_constant=_reject_constant)
+    return text
 
 # Function to clean data recursively
 def clean_data(data):
@@ -74,123 +98,135 @@ def clean_text(text):
     return text
 
 # Step 1: Load all Excel files into pandas DataFrames
-crown_objects_df = pd.read_excel('data/CROWN_Objects_1_2024_02_02.xlsx')
-crown_objects_medien_df = pd.read_excel('data/CROWN_Objects_6_Medien_2024_02_02.xlsx')
-crown_restaurierung_df = pd.read_excel('data/CROWN_Restaurierung_1_2024_02_02.xlsx')
-crown_restaurierung_2_df = pd.read_excel('data/CROWN_Restaurierung_2_2024_02_02.xlsx')
-crown_restaurierung_3_medien_df = pd.read_excel('data/CROWN_Restaurierung_3_Medien_2024_02_02.xlsx')
-crown_userfields_df = pd.read_excel('data/crown-userfields.xlsx')
-
-# Step 2: Initialize the final list to hold all objects data
-all_objects_data = []
-
-# Step 3: Loop through each object in CROWN_Objects
-for _, object_row in crown_objects_df.iterrows():
-    object_id = object_row['ObjectID']
-    object_number = object_row['ObjectNumber']
-
-    # Step 4: Extract object metadata
-    object_data = {
-        "ObjectID": object_id,
-        "ObjectNumber": object_row['ObjectNumber'],
-        "ObjectName": object_row['ObjectName'],
-        "Dated": object_row['Dated'],
-        "DateBegin": object_row['DateBegin'],
-        "DateEnd": object_row['DateEnd'],
-        "Medium": object_row['Medium'],
-        "Dimensions": object_row['Dimensions'],
-        "Description": clean_text(object_row['Description']),
-        "Authority50ID": object_row['AuthorityID'],
-        "Bestandteil": object_row['Bestandteil']
+def load_tables(data_dir=DATA_DIR):
+    return {
+        'objects': read_excel_cached(os.path.join(data_dir, 'CROWN_Objects_1_2024_02_02.xlsx')),
+        'objects_medien': read_excel_cached(os.path.join(data_dir, 'CROWN_Objects_6_Medien_2024_02_02.xlsx')),
+        'restaurierung': read_excel_cached(os.path.join(data_dir, 'CROWN_Restaurierung_1_2024_02_02.xlsx')),
+        'restaurierung_2': read_excel_cached(os.path.join(data_dir, 'CROWN_Restaurierung_2_2024_02_02.xlsx')),
+        'restaurierung_3_medien': read_excel_cached(os.path.join(data_dir, 'CROWN_Restaurierung_3_Medien_2024_02_02.xlsx')),
+        'userfields': read_excel_cached(os.path.join(data_dir, 'crown-userfields.xlsx')),
     }
-    object_data = clean_data(object_data)  # Clean data
-
-    # Step 5: Extract associated media from CROWN_Objects_6_Medien
-    media_files = crown_objects_medien_df[crown_objects_medien_df['ObjectID'] == object_id]
-    object_media = []
-    for _, media_row in media_files.iterrows():
-        media_entry = {
-            "MediaMasterID": media_row['MediaMasterID'],
-            "RenditionNumber": media_row['RenditionNumber'],
-            "MediaType": media_row['MediaType'],
-            "Path": media_row['Path'],
-            "FileName": media_row['FileName']
+
+# Group the rows of a child table by its key column once, keeping row order
+def group_positions(df, key):
+    return df.groupby(key, sort=False).indices
+
+def media_entry(media_row):
+    return clean_data({
+        "MediaMasterID": media_row['MediaMasterID'],
+        "RenditionNumber": media_row['RenditionNumber'],
+        "MediaType": media_row['MediaType'],
+        "Path": media_row['Path'],
+        "FileName": media_row['FileName']
+    })
+
+# Step 2: Build the nested document of every object from the grouped child tables
+def build_object_documents(tables):
+    objects_medien_df = tables['objects_medien']
+    restaurierung_df = tables['restaurierung']
+    restaurierung_2_df = tables['restaurierung_2']
+    restaurierung_3_medien_df = tables['restaurierung_3_medien']
+    userfields_df = tables['userfields']
+
+    media_by_object = group_positions(objects_medien_df, 'ObjectID')
+    interventions_by_object_number = group_positions(restaurierung_df, 'ObjectNumber')
+    details_by_condition = group_positions(restaurierung_2_df, 'ConditionID')
+    media_by_line_item = group_positions(restaurierung_3_medien_df, 'CondLineItemID')
+    userfields_by_id = group_positions(userfields_df, 'ID')
+
+    objects_medien_records = objects_medien_df.to_dict(orient='records')
+    restaurierung_records = restaurierung_df.to_dict(orient='records')
+    restaurierung_2_records = restaurierung_2_df.to_dict(orient='records')
+    restaurierung_3_medien_records = restaurierung_3_medien_df.to_dict(orient='records')
+    userfields_records = userfields_df.to_dict(orient='records')
+    no_rows = []
+
+    # Step 3: Loop through each object in CROWN_Objects
+    for object_row in tables['objects'].to_dict(orient='records'):
+        object_id = object_row['ObjectID']
+        object_number = object_row['ObjectNumber']
+
+        # Step 4: Extract object metadata
+        object_data = {
+            "ObjectID": object_id,
+            "ObjectNumber": object_row['ObjectNumber'],
+            "ObjectName": object_row['ObjectName'],
+            "Dated": object_row['Dated'],
+            "DateBegin": object_row['DateBegin'],
+            "DateEnd": object_row['DateEnd'],
+            "Medium": object_row['Medium'],
+            "Dimensions": object_row['Dimensions'],
+            "Description": clean_text(object_row['Description']),
+            "Authority50ID": object_row['AuthorityID'],
+            "Bestandteil": object_row['Bestandteil']
         }
-        media_entry = clean_data(media_entry)
-        object_media.append(media_entry)
-
-    if object_media:
-        object_data['Media'] = object_media
-
-    # Step 6: Extract associated interventions from CROWN_Restaurierung
-    interventions = crown_restaurierung_df[crown_restaurierung_df['ObjectNumber'] == object_number]
-    object_interventions = []
-
-    for _, intervention_row in interventions.iterrows():
-        condition_id = intervention_row['ConditionID']
-
-        # Extract detailed intervention data from CROWN_Restaurierung_2
-        intervention_details = crown_restaurierung_2_df[crown_restaurierung_2_df['ConditionID'] == condition_id]
-        details_list = []
-        for _, detail_row in intervention_details.iterrows():
-            detail_entry = {
-                "CondLineItemID": detail_row['CondLineItemID'],
-                "AttributeType": detail_row['AttributeType'],
-                "BriefDescription": clean_text(detail_row['BriefDescription']),
-                "Statement": clean_text(detail_row['Statement']),
-                "Proposal": clean_text(detail_row['Proposal']),
-                "ActionTaken": detail_row['ActionTaken'],
-                "DateCompleted": detail_row['DateCompleted'],
-                "Treatment": clean_text(detail_row['Treatment'])
-            }
-            detail_entry = clean_data(detail_entry)
-            details_list.append(detail_entry)
-
-        # Extract related media from CROWN_Restaurierung_3_Medien
-        related_media = crown_restaurierung_3_medien_df[crown_restaurierung_3_medien_df['CondLineItemID'].isin(intervention_details['CondLineItemID'])]
-        related_media_list = []
-        for _, media_row in related_media.iterrows():
-            related_media_entry = {
-                "MediaMasterID": media_row['MediaMasterID'],
-                "RenditionNumber": media_row['RenditionNumber'],
-                "MediaType": media_row['MediaType'],
-                "Path": media_row['Path'],
-                "FileName": media_row['FileName']
+        object_data = clean_data(object_data)  # Clean data
+
+        # Step 5: Extract associated media from CROWN_Objects_6_Medien
+        object_media = [media_entry(objects_medien_records[i]) for i in media_by_object.get(object_id, no_rows)]
+        if object_media:
+            object_data['Media'] = object_media
+
+        # Step 6: Extract associated interventions from CROWN_Restaurierung
+        object_interventions = []
+        for i in interventions_by_object_number.get(object_number, no_rows):
+            intervention_row = restaurierung_records[i]
+            condition_id = intervention_row['ConditionID']
+
+            # Extract detailed intervention data from CROWN_Restaurierung_2
+            detail_positions = details_by_condition.get(condition_id, no_rows)
+            details_list = []
+            for j in detail_positions:
+                detail_row = restaurierung_2_records[j]
+                detail_entry = {
+                    "CondLineItemID": detail_row['CondLineItemID'],
+                    "AttributeType": detail_row['AttributeType'],
+                    "BriefDescription": clean_text(detail_row['BriefDescription']),
+                    "Statement": clean_text(detail_row['Statement']),
+                    "Proposal": clean_text(detail_row['Proposal']),
+                    "ActionTaken": detail_row['ActionTaken'],
+                    "DateCompleted": detail_row['DateCompleted'],
+                    "Treatment": clean_text(detail_row['Treatment'])
+                }
+                detail_entry = clean_data(detail_entry)
+                details_list.append(detail_entry)
+
+            # Extract related media from CROWN_Restaurierung_3_Medien, in table order
+            line_item_ids = {restaurierung_2_records[j]['CondLineItemID'] for j in detail_positions}
+            media_positions = sorted(k for line_item_id in line_item_ids for k in media_by_line_item.get(line_item_id, no_rows))
+            related_media_list = [media_entry(restaurierung_3_medien_records[k]) for k in media_positions]
+
+            intervention_entry = {
+                "SurveyISODate": intervention_row['SurveyISODate'],
+                "SurveyType": intervention_row['SurveyType'],
+                "Project": intervention_row['Project'],
+                "Examiner": {
+                    "ExaminerID": intervention_row['ExaminerID'],
+                    "Name": intervention_row['dbo_Constituents_DisplayName']
+                },
+                "ConditionID": condition_id,
+                "Details": details_list,
+                "RelatedMedia": related_media_list
             }
-            related_media_entry = clean_data(related_media_entry)
-            related_media_list.append(related_media_entry)
-
-        intervention_entry = {
-            "SurveyISODate": intervention_row['SurveyISODate'],
-            "SurveyType": intervention_row['SurveyType'],
-            "Project": intervention_row['Project'],
-            "Examiner": {
-                "ExaminerID": intervention_row['ExaminerID'],
-                "Name": intervention_row['dbo_Constituents_DisplayName']
-            },
-            "ConditionID": condition_id,
-            "Details": details_list,
-            "RelatedMedia": related_media_list
-        }
-        intervention_entry = clean_data(intervention_entry)
-        object_interventions.append(intervention_entry)
-
-    if object_interventions:
-        object_data['Interventions'] = object_interventions
-
-    # Step 7: Extract condition attributes from CROWN_Userfields
-    condition_attributes = crown_userfields_df[crown_userfields_df['ID'] == object_id].to_dict(orient='records')
-    if condition_attributes:
-        cond_attr = condition_attributes[0]
-        cond_attr.pop('ID', None)  # Remove 'ID' field
-        cond_attr = clean_data(cond_attr)  # Clean data
-        cond_attr = group_fields(cond_attr)  # Group fields
-        if cond_attr:
-            object_data['ConditionAttributes'] = cond_attr
-
-    # Append this object data to the final list
-    if object_data:
-        all_objects_data.append(object_data)
+            intervention_entry = clean_data(intervention_entry)
+            object_interventions.append(intervention_entry)
+
+        if object_interventions:
+            object_data['Interventions'] = object_interventions
+
+        # Step 7: Extract condition attributes from CROWN_Userfields
+        userfield_positions = userfields_by_id.get(object_id, no_rows)
+        if len(userfield_positions):
+            cond_attr = dict(userfields_records[userfield_positions[0]])
+            cond_attr.pop('ID', None)  # Remove 'ID' field
+            cond_attr = clean_data(cond_attr)  # Clean data
+            cond_attr = group_fields(cond_attr)  # Group fields
+            if cond_attr:
+                object_data['ConditionAttributes'] = cond_attr
+
+        if object_data:
+            yield object_data
 
 # Step 8: Define a custom function to handle non-serializable objects
 def custom_json_serializer(obj):
@@ -198,8 +234,78 @@ def custom_json_serializer(obj):
         return obj.isoformat()
     raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
 
-# Step 9: Write and valdiate the final JSON file
-file_path = 'crown_data.json'
-with open(file_path, 'w', encoding='utf-8') as json_file:
-    json.dump(all_objects_data, json_file, default=custom_json_serializer, indent=4, sort_keys=True, ensure_ascii=False)
-validate_json_file(file_path)
+# Step 9: Write and validate the output, one object at a time
+def write_json_array(documents, file_path):
+    # Same bytes as json.dump(list, indent=4), without holding the list in memory
+    count = 0
+    with open(file_path, 'w', encoding='utf-8') as json_file:
+        for document in documents:
+            json_file.write('[\n' if count == 0 else ',\n')
+            json_file.write(textwrap.indent(dumps_validated(document, indent=4), '    '))
+            count += 1
+        json_file.write('\n]' if count else '[]')
+    return count
+
+def write_ndjson(documents, file_path):
+    count = 0
+    with open(file_path, 'w', encoding='utf-8') as ndjson_file:
+        for document in documents:
+            ndjson_file.write(dumps_validated(document, separators=(',', ':')) + '\n')
+            count += 1
+    return count
+
+# Fields copied into the shard manifest so pages can pick objects without fetching them
+SHARD_INDEX_FIELDS = ['ObjectID', 'ObjectNumber', 'ObjectName', 'Medium', 'Bestandteil']
+
+def write_shards(documents, out_dir):
+    objects_dir = os.path.join(out_dir, 'objects')
+    os.makedirs(objects_dir, exist_ok=True)
+    count = 0
+    with open(os.path.join(out_dir, 'index.json'), 'w', encoding='utf-8') as index_file:
+        for document in documents:
+            shard_name = f"objects/{document['ObjectID']}.json"
+            with open(os.path.join(out_dir, shard_name), 'w', encoding='utf-8') as shard_file:
+                shard_file.write(dumps_validated(document, separators=(',', ':')))
+            entry = {field: document[field] for field in SHARD_INDEX_FIELDS if field in document}
+            entry['file'] = shard_name
+            index_file.write('[\n' if count == 0 else ',\n')
+            index_file.write(dumps_validated(entry, separators=(',', ':')))
+            count += 1
+        index_file.write('\n]\n' if count else '[]\n')
+    return count
+
+WRITERS = {
+    'json': (write_json_array, 'crown_data.json'),
+    'ndjson': (write_ndjson, 'crown_data.ndjson'),
+    'shards': (write_shards, 'crown_data'),
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the CROWN workbooks as JSON.")
+    parser.add_argument('--format', choices=sorted(WRITERS), default='json')
+    parser.add_argument('--output', help="output file, or directory for shards (default: in --data-dir)")
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--aggregates', metavar='DIR', help="also write the per-page aggregate bundles to DIR")
+    parser.add_argument('--precompress', action='store_true', help="also write .gz (and .br) copies of every output file")
+    args = parser.parse_args(argv)
+
+    writer, default_output = WRITERS[args.format]
+    file_path = args.output or os.path.join(args.data_dir, default_output)
+    tables = load_tables(args.data_dir)
+    if args.aggregates:
+        names = write_page_aggregates(tables, args.aggregates)
+        print(f"Wrote {len(names)} aggregate bundles to {args.aggregates}: {', '.join(names)}")
+    try:
+        count = writer(build_object_documents(tables), file_path)
+    except ValueError as e:
+        print(f"The file {file_path} contains invalid JSON.")
+        print(f"Error: {str(e)}")
+        return 1
+    print(f"The file {file_path} contains valid JSON ({count} objects).")
+    if args.precompress:
+        for path in [file_path] + ([args.aggregates] if args.aggregates else []):
+            print(f"Pre-compressed {precompress(path)} files in {path}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""Server-side paging, sorting and filtering for the dashboard's DataTables.
+
+The tables run with page_action, sort_action and filter_action set to
+'custom'. Every request carries the table's filter_query, sort_by and page;
+this module turns them into vectorized pandas operations on a result frame
+and returns only the visible page.
+"""
+import math
+import re
+
+import pandas as pd
+
+# One "{column} operator value" or "{column} is ..." clause of a filter_query
+_CLAUSE = re.compile(r"""
+    \s*\{(?P<column>(?:[^{}\\]|\\.)+)\}\s*
+    (?:
+        (?P<unary>is\s+(?:not\s+)?(?:blank|nil|num|str|bool))(?=\s|$)
+      | (?P<operator>datestartswith|[is]?(?:contains|eq|ne|ge|le|gt|lt)(?=\s)|[is]?(?:>=|<=|!=|=|>|<))
+        \s*(?P<value>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*'|`(?:[^`\\]|\\.)*`|(?:[^\s'"`{}()\\]|\\.)+)
+    )
+""", re.VERBOSE | re.IGNORECASE)
+
+_CONNECTOR = re.compile(r"\s*(?P<connector>&&|\|\||and(?=\s)|or(?=\s))", re.IGNORECASE)
+
+_OPERATOR_NAMES = {'=': 'eq', '!=': 'ne', '<': 'lt', '<=': 'le', '>': 'gt', '>=': 'ge'}
+
+
+def _parse_value(raw):
+    if raw[0] in '"\'`':
+        return re.sub(r'\\(.)', r'\1', raw[1:-1])
+    value = re.sub(r'\\(.)', r'\1', raw)
+    try:
+        number = float(value)
+    except ValueError:
+        return value
+    return int(number) if number.is_integer() and '.' not in value else number
+
+
+def parse_filter_query(filter_query):
+    """Parse a DataTable filter_query.
+
+    Returns a list of OR-ed groups, each a list of AND-ed clauses given as
+    (column, operator, value, case_insensitive) tuples. An invalid query
+    yields an empty list, i.e. no filtering, as the native table does.
+    """
+    query = (filter_query or '').strip()
+    groups = [[]]
+    pos = 0
+    while pos < len(query):
+        connector = _CONNECTOR.match(query, pos)
+        if connector and groups[-1]:
+            if connector.group('connector').lower() in ('||', 'or'):
+                groups.append([])
+            pos = connector.end()
+            continue
+        clause = _CLAUSE.match(query, pos)
+        if not clause:
+            return []
+        column = re.sub(r'\\(.)', r'\1', clause.group('column'))
+        if clause.group('unary'):
+            groups[-1].append((column, ' '.join(clause.group('unary').lower().split()), None, False))
+        else:
+            operator = clause.group('operator').lower()
+            # A leading 'i' or 's' selects case-insensitive or case-sensitive matching
+            case_insensitive = operator[0] == 'i'
+            if operator[0] in 'is':
+                operator = operator[1:]
+            operator = _OPERATOR_NAMES.get(operator, operator)
+            groups[-1].append((column, operator, _parse_value(clause.group('value')), case_insensitive))
+        pos = clause.end()
+    return [group for group in groups if group]
+
+
+def _as_text(series, case_insensitive):
+    text = series.map(str, na_action='ignore')
+    return text.str.lower() if case_insensitive else text
+
+
+def _clause_mask(df, column, operator, value, case_insensitive):
+    if column not in df.columns:
+        return pd.Series(False, index=df.index)
+    series = df[column]
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Test each category once, plus a missing value for code -1, and look the rows up by code
+        values = pd.Series(list(series.cat.categories) + [None], dtype=object)
+        category_mask = _series_mask(values, operator, value, case_insensitive).to_numpy(dtype=bool)
+        return pd.Series(category_mask[series.cat.codes.to_numpy()], index=df.index)
+    return _series_mask(series, operator, value, case_insensitive)
+
+
+def _series_mask(series, operator, value, case_insensitive):
+    if operator.startswith('is '):
+        negate = operator.startswith('is not ')
+        kind = operator.split()[-1]
+        if kind == 'nil':
+            mask = series.isna()
+        elif kind == 'blank':
+            mask = series.isna() | (series.map(str, na_action='ignore').str.strip() == '')
+        elif kind == 'num':
+            mask = series.map(lambda v: isinstance(v, (int, float)) and not isinstance(v, bool) and not pd.isna(v))
+        elif kind == 'str':
+            mask = series.map(lambda v: isinstance(v, str))
+        else:
+            mask = series.map(lambda v: isinstance(v, bool))
+        return ~mask if negate else mask
+
+    if operator == 'contains':
+        text = _as_text(series, case_insensitive)
+        needle = str(value).lower() if case_insensitive else str(value)
+        return text.str.contains(needle, regex=False, na=False)
+    if operator == 'datestartswith':
+        return series.map(str, na_action='ignore').str.startswith(str(value), na=False)
+
+    # Relational operators compare numbers numerically and everything else as text
+    if isinstance(value, (int, float)):
+        left = pd.to_numeric(series, errors='coerce')
+    else:
+        left = _as_text(series, case_insensitive)
+        value = value.lower() if case_insensitive else value
+    mask = getattr(left, operator)(value)
+    return mask & left.notna()
+
+
+def filter_frame(df, filter_query):
+    """Return the rows of df matching a DataTable filter_query."""
+    groups = parse_filter_query(filter_query)
+    if not groups:
+        return df
+    mask = pd.Series(False, index=df.index)
+    for group in groups:
+        group_mask = pd.Series(True, index=df.index)
+        for clause in group:
+            group_mask &= _clause_mask(df, *clause)
+        mask |= group_mask
+    return df[mask]
+
+
+def _sort_key(series):
+    # Object columns mix numbers and strings; order them, and categoricals, by their text
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(object)
+    return series.map(str, na_action='ignore') if series.dtype == object else series
+
+
+def sort_frame(df, sort_by):
+    """Sort df by a DataTable sort_by list."""
+    sort_by = [s for s in (sort_by or []) if s['column_id'] in df.columns]
+    if not sort_by:
+        return df
+    return df.sort_values(
+        [s['column_id'] for s in sort_by],
+        ascending=[s['direction'] == 'asc' for s in sort_by],
+        kind='mergesort',
+        na_position='last',
+        key=_sort_key
+    )
+
+
+def page_records(df, page_current, page_size):
+    """Return the records of one page and the total page count."""
+    page_current = page_current or 0
+    start = page_current * page_size
+    page_count = max(1, math.ceil(len(df) / page_size))
+    return df.iloc[start:start + page_size].to_dict('records'), page_count
@@ -0,0 +1,36 @@
+"""The damage page and the cross-filter page count damage the same way."""
+import numpy as np
+import pandas as pd
+
+from damage_index import build_damage_index, damage_presence, query_damage
+
+
+def test_flag_recorded_as_zero_is_no_damage():
+    data = pd.DataFrame({
+        'ObjectID': [1, 2, 3, 4],
+        'Bestandteil': ['Kronreif', 'Kronreif', 'Kronreif', 'Bügel'],
+        'Fehlstellen:': pd.array([True, False, pd.NA, True], dtype='boolean'),
+        'Fehlstellen: Beschreibung': ['klein', 'klein', None, None],
+    })
+    present = damage_presence(data, ['Fehlstellen:', 'Fehlstellen: Beschreibung'])
+    assert present['Fehlstellen:'].tolist() == [True, False, False, True]
+    # Descriptions count when filled
+    assert present['Fehlstellen: Beschreibung'].tolist() == [True, True, False, False]
+
+    index = build_damage_index(data, ['Fehlstellen:'])
+    assert index[('Kronreif', 'Fehlstellen:')].tolist() == [1]
+    assert index[('Bügel', 'Fehlstellen:')].tolist() == [4]
+
+
+def test_damage_page_matches_cross_filter():
+    import app
+    from feature_matrix import query_features
+
+    snapshot = app.snapshots.current()
+    damage_page = query_damage(snapshot.damage_index, ['Kronreif'], ['Fehlstellen:'])
+    cross_filter = query_features(snapshot.feature_matrix, all_of=['component=Kronreif', 'damage=Fehlstellen:'])
+    assert len(damage_page) > 0
+    assert np.array_equal(damage_page, np.sort(cross_filter))
+
+    counts = snapshot.filtered_damage_counts.set_index('Bestandteil')
+    assert counts.loc['Kronreif', 'Fehlstellen:'] == len(damage_page)
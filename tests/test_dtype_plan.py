@@ -0,0 +1,10 @@
+"""The dtype plan covers only columns the loader reads."""
+from dtype_plan import DTYPE_PLAN
+from excel_loader import COLUMN_MANIFEST
+
+
+def test_planned_columns_are_loaded():
+    for name, plan in DTYPE_PLAN.items():
+        assert name in COLUMN_MANIFEST
+        missing = [col for col in plan if col not in COLUMN_MANIFEST[name]]
+        assert not missing, f"{name}: {missing} are planned but not loaded"
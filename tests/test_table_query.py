@@ -0,0 +1,104 @@
+"""Server-side filtering, sorting and paging of the DataTables (table_query.py)."""
+import pandas as pd
+
+from table_query import filter_frame, page_records, parse_filter_query, sort_frame
+
+
+def objects():
+    return pd.DataFrame({
+        'ObjectID': [3, 1, 20, 4],
+        'ObjectName': ['Kreuz mit Perle', 'Bügel', 'Kronreif', None],
+        'Medium': pd.Categorical(['Gold; Email', 'Gold', 'Silber', None]),
+        'DateBegin': [1400, 1350, 1500, None],
+    })
+
+
+def ids(df):
+    return df['ObjectID'].tolist()
+
+
+def test_parse_operators_and_quoting():
+    assert parse_filter_query('{ObjectName} contains "Kreuz mit"') == [[('ObjectName', 'contains', 'Kreuz mit', False)]]
+    assert parse_filter_query("{ObjectName} icontains 'kreuz'") == [[('ObjectName', 'contains', 'kreuz', True)]]
+    assert parse_filter_query(r'{ObjectName} = "say \"hi\""') == [[('ObjectName', 'eq', 'say "hi"', False)]]
+    assert parse_filter_query('{DateBegin} >= 1400') == [[('DateBegin', 'ge', 1400, False)]]
+    assert parse_filter_query('{DateBegin} lt 14.5') == [[('DateBegin', 'lt', 14.5, False)]]
+    assert parse_filter_query(r'{Riss/Bruch\: Häufigkeit} is blank') == [[('Riss/Bruch: Häufigkeit', 'is blank', None, False)]]
+
+
+def test_parse_connectors():
+    assert parse_filter_query('{a} = 1 && {b} = 2 || {c} = "x"') == [
+        [('a', 'eq', 1, False), ('b', 'eq', 2, False)],
+        [('c', 'eq', 'x', False)],
+    ]
+    assert parse_filter_query('{a} = 1 and {b} = 2') == [[('a', 'eq', 1, False), ('b', 'eq', 2, False)]]
+
+
+def test_invalid_queries_do_not_filter():
+    df = objects()
+    for query in ['', '{ObjectName} matches "Gold"', '{ObjectName} contains', 'ObjectName = 1', '{ObjectName} = "open']:
+        assert parse_filter_query(query) == []
+        assert ids(filter_frame(df, query)) == ids(df)
+
+
+def test_quoted_value_with_spaces():
+    assert ids(filter_frame(objects(), '{ObjectName} contains "mit Perle"')) == [3]
+    assert ids(filter_frame(objects(), '{ObjectName} icontains "KREUZ MIT"')) == [3]
+    assert ids(filter_frame(objects(), '{ObjectName} scontains "KREUZ MIT"')) == []
+
+
+def test_numeric_and_text_comparisons():
+    df = objects()
+    # Numbers compare numerically, so 20 > 4 although '20' < '4' as text
+    assert ids(filter_frame(df, '{ObjectID} > 4')) == [20]
+    assert ids(filter_frame(df, '{DateBegin} <= 1400')) == [3, 1]
+    # A quoted value compares as text
+    assert ids(filter_frame(df, '{ObjectID} > "4"')) == []
+    assert ids(filter_frame(df, '{ObjectName} = "Kronreif"')) == [20]
+    assert ids(filter_frame(df, '{ObjectName} ieq "kronreif"')) == [20]
+
+
+def test_categorical_and_unary_clauses():
+    df = objects()
+    assert ids(filter_frame(df, '{Medium} contains "Gold"')) == [3, 1]
+    assert ids(filter_frame(df, '{Medium} is blank')) == [4]
+    assert ids(filter_frame(df, '{ObjectName} is not nil')) == [3, 1, 20]
+    assert ids(filter_frame(df, '{DateBegin} is num')) == [3, 1, 20]
+    assert ids(filter_frame(df, '{ObjectName} is str')) == [3, 1, 20]
+
+
+def test_or_groups_and_unknown_columns():
+    df = objects()
+    assert ids(filter_frame(df, '{ObjectID} = 1 || {ObjectID} = 20')) == [1, 20]
+    assert ids(filter_frame(df, '{Medium} contains "Gold" && {DateBegin} > 1380')) == [3]
+    assert ids(filter_frame(df, '{NoSuchColumn} = 1')) == []
+
+
+def test_sort_frame():
+    df = objects()
+    assert ids(sort_frame(df, [{'column_id': 'ObjectID', 'direction': 'asc'}])) == [1, 3, 4, 20]
+    # Missing values sort last in both directions
+    assert ids(sort_frame(df, [{'column_id': 'DateBegin', 'direction': 'desc'}])) == [20, 3, 1, 4]
+    assert ids(sort_frame(df, [{'column_id': 'Medium', 'direction': 'asc'}])) == [1, 3, 20, 4]
+    assert ids(sort_frame(df, [{'column_id': 'NoSuchColumn', 'direction': 'asc'}])) == ids(df)
+    assert ids(sort_frame(df, [])) == ids(df)
+
+
+def test_sort_is_stable_over_several_columns():
+    df = pd.DataFrame({'ObjectID': [1, 2, 3, 4], 'Bestandteil': ['b', 'a', 'b', 'a'], 'Medium': ['x', 'x', 'y', 'x']})
+    sort_by = [{'column_id': 'Bestandteil', 'direction': 'asc'}, {'column_id': 'Medium', 'direction': 'desc'}]
+    assert ids(sort_frame(df, sort_by)) == [2, 4, 3, 1]
+
+
+def test_page_records():
+    df = pd.DataFrame({'ObjectID': range(45)})
+    records, page_count = page_records(df, 0, 20)
+    assert page_count == 3
+    assert [r['ObjectID'] for r in records] == list(range(20))
+
+    records, _ = page_records(df, 2, 20)
+    assert [r['ObjectID'] for r in records] == list(range(40, 45))
+
+    assert page_records(df, None, 20)[0][0]['ObjectID'] == 0
+    assert page_records(df, 5, 20)[0] == []
+    assert page_records(df.iloc[0:0], 0, 20) == ([], 1)
@@ -0,0 +1,207 @@
+"""Full-text search over the object texts, ranked with BM25.
+
+Every object is one document made of its Description and Notes, its
+entries in the TextEntries workbook and the Treatment and Statement of its
+restoration records. The words are folded for German: lower case, ä/ö/ü/ß
+written as ae/oe/ue/ss (so 'Bügel' and 'Buegel' match), other accents
+dropped, and the _x000d_ artefacts of the Excel export removed.
+
+The inverted index keeps its postings in three flat arrays (CSR layout):
+the postings of term i are postings[offsets[i]:offsets[i + 1]], with the
+matching term frequencies alongside. A query scores only the postings of
+its own terms, so it takes a few milliseconds. A query word ending in '*'
+matches every term starting with it, which helps with German compounds
+('Email*' finds 'Emailschicht').
+"""
+import bisect
+import math
+import re
+import unicodedata
+from collections import Counter, namedtuple
+
+import numpy as np
+import pandas as pd
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+ARTIFACT = re.compile(r'_x000d_', re.IGNORECASE)
+WORD = re.compile(r'[^\W_]+')
+QUERY_WORD = re.compile(r'([^\W_]+)(\*?)')
+COMBINING_MARKS = re.compile('[\u0300-\u036f]')
+UMLAUTS = str.maketrans({'ä': 'ae', 'ö': 'oe', 'ü': 'ue', 'ß': 'ss'})
+
+# Folded German function words, left out of the index
+STOPWORDS = frozenset("""
+    aber als am an auch auf aus bei bis bzw ca da das dass dem den der des die durch ein eine einem einen
+    einer eines es ev evtl fuer hat haben im in ist mit nach nicht noch nur oder sich sind so sowie teilweise
+    ueber um und unter vom von vor war werden wie wird wurde zu zum zur zwischen
+""".split())
+
+SNIPPET_CONTEXT = 60
+
+SearchIndex = namedtuple('SearchIndex', [
+    'objects', 'texts', 'vocabulary', 'term_ids', 'offsets', 'postings', 'frequencies', 'doc_lengths', 'avg_length'
+])
+
+
+def clean_text(text):
+    """Remove the _x000d_ artefacts of the Excel export."""
+    return ARTIFACT.sub('', text)
+
+
+def fold(text):
+    """Lower-case text, spell out umlauts and drop other accents."""
+    text = text.lower()
+    if text.isascii():
+        return text
+    # Compose first, so a decomposed 'u' + diaeresis is spelled out too
+    text = unicodedata.normalize('NFC', text).translate(UMLAUTS)
+    return COMBINING_MARKS.sub('', unicodedata.normalize('NFKD', text))
+
+
+def folded_terms(folded):
+    """Return the indexed terms of an already folded text, in order."""
+    return [word for word in WORD.findall(folded) if len(word) > 1 and word not in STOPWORDS]
+
+
+def tokenize(text):
+    """Return the indexed terms of a text, in order."""
+    return folded_terms(fold(clean_text(text)))
+
+
+def parse_query(query):
+    """Return the (term, is_prefix) pairs of a query; a trailing '*' makes a word a prefix."""
+    terms = {}
+    for match in QUERY_WORD.finditer(fold(query)):
+        word, star = match.groups()
+        if len(word) > 1 and (star or word not in STOPWORDS):
+            terms[word, bool(star)] = None
+    return list(terms)
+
+
+def document_texts(objects_df, text_entries_df, restaurierung_1_df, restaurierung_2_df):
+    """Return, per row of objects_df, the list of (field, text, folded text) making up its document.
+
+    The text is cleaned and its whitespace collapsed, for showing snippets.
+    """
+    parts = []
+    for field in ['Description', 'Notes']:
+        if field in objects_df.columns:
+            parts.append(pd.DataFrame({'ObjectID': objects_df['ObjectID'], 'Field': field, 'Text': objects_df[field]}))
+    if text_entries_df is not None:
+        parts.append(pd.DataFrame({
+            'ObjectID': text_entries_df['ID'],
+            'Field': text_entries_df['TextType'].astype(object),
+            'Text': text_entries_df['TextEntry']
+        }))
+    conditions = restaurierung_1_df[['ID', 'ConditionID']].merge(restaurierung_2_df, on='ConditionID')
+    for field in ['Treatment', 'Statement']:
+        if field in conditions.columns:
+            parts.append(pd.DataFrame({'ObjectID': conditions['ID'], 'Field': field, 'Text': conditions[field]}))
+
+    texts = pd.concat(parts, ignore_index=True)
+    texts = texts[texts['Text'].map(lambda text: isinstance(text, str) and bool(text.strip()))]
+    # Restoration records of one object often repeat the same treatment text
+    texts = texts.drop_duplicates(['ObjectID', 'Field', 'Text'])
+    texts = texts.assign(Text=texts['Text'].map(lambda text: ' '.join(clean_text(text).split())))
+    texts = texts.assign(Folded=texts['Text'].map(fold))
+    by_object = {}
+    for object_id, field, text, folded in zip(texts['ObjectID'], texts['Field'], texts['Text'], texts['Folded']):
+        by_object.setdefault(object_id, []).append((field, text, folded))
+    return [by_object.get(object_id, []) for object_id in objects_df['ObjectID']]
+
+
+def build_search_index(objects_df, text_entries_df, restaurierung_1_df, restaurierung_2_df):
+    """Build the SearchIndex over every object of objects_df."""
+    texts = document_texts(objects_df, text_entries_df, restaurierung_1_df, restaurierung_2_df)
+    term_counts = [Counter(term for _, _, folded in document for term in folded_terms(folded)) for document in texts]
+
+    vocabulary = sorted({term for counts in term_counts for term in counts})
+    term_ids = {term: i for i, term in enumerate(vocabulary)}
+    entries = [(term_ids[term], doc, count) for doc, counts in enumerate(term_counts) for term, count in counts.items()]
+    entries = np.array(entries, dtype=np.int64).reshape(-1, 3)
+    # Group the postings by term; a stable sort keeps each term's documents in order
+    entries = entries[np.argsort(entries[:, 0], kind='stable')]
+    offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(entries[:, 0], minlength=len(vocabulary)), out=offsets[1:])
+
+    doc_lengths = np.array([sum(counts.values()) for counts in term_counts], dtype=np.float64)
+    display_columns = [col for col in ['ObjectID', 'ObjectNumber', 'ObjectName', 'Bestandteil'] if col in objects_df.columns]
+    return SearchIndex(
+        objects=objects_df[display_columns].reset_index(drop=True),
+        texts=texts,
+        vocabulary=vocabulary,
+        term_ids=term_ids,
+        offsets=offsets,
+        postings=entries[:, 1].astype(np.int32),
+        frequencies=entries[:, 2].astype(np.int32),
+        doc_lengths=doc_lengths,
+        avg_length=doc_lengths.mean() if len(doc_lengths) and doc_lengths.mean() else 1.0
+    )
+
+
+def _expand(index, term, is_prefix):
+    """Term ids a query term matches."""
+    if not is_prefix:
+        term_id = index.term_ids.get(term)
+        return [] if term_id is None else [term_id]
+    start = bisect.bisect_left(index.vocabulary, term)
+    end = start
+    while end < len(index.vocabulary) and index.vocabulary[end].startswith(term):
+        end += 1
+    return range(start, end)
+
+
+def search(index, query, limit=None):
+    """Return (document positions, scores) of the documents matching query, best first."""
+    n_docs = len(index.doc_lengths)
+    scores = np.zeros(n_docs)
+    length_norm = K1 * (1 - B + B * index.doc_lengths / index.avg_length)
+    for term, is_prefix in parse_query(query):
+        for term_id in _expand(index, term, is_prefix):
+            start, end = index.offsets[term_id], index.offsets[term_id + 1]
+            docs = index.postings[start:end]
+            frequencies = index.frequencies[start:end]
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            # A term's postings hold each document once, so fancy-index addition is safe
+            scores[docs] += idf * frequencies * (K1 + 1) / (frequencies + length_norm[docs])
+
+    hits = np.flatnonzero(scores)
+    if limit is not None and len(hits) > limit:
+        hits = hits[np.argpartition(-scores[hits], limit - 1)[:limit]]
+    order = hits[np.argsort(-scores[hits], kind='stable')]
+    return order, scores[order]
+
+
+def snippet(document, query_terms):
+    """Return 'Field: …text…' around the first word of document matching a query term."""
+    for field, text, folded in document:
+        found = [folded.find(term) for term, _ in query_terms]
+        found = [pos for pos in found if pos >= 0]
+        if not found:
+            continue
+        # Folding only lengthens text (ä -> ae), so the word starts at most this far before its folded position
+        start = max(min(found) - max(len(folded) - len(text), 0), 0)
+        while start > 0 and text[start - 1].isalnum():
+            start -= 1
+        for match in WORD.finditer(text, start):
+            word = fold(match.group())
+            if any(word.startswith(term) if is_prefix else word == term for term, is_prefix in query_terms):
+                start = max(match.start() - SNIPPET_CONTEXT, 0)
+                end = match.end() + SNIPPET_CONTEXT
+                prefix = '…' if start > 0 else ''
+                suffix = '…' if end < len(text) else ''
+                return f"{field}: {prefix}{text[start:end]}{suffix}"
+    return ''
+
+
+def search_results(index, query, limit=None):
+    """Return the matching objects, best first, with their BM25 score and a snippet of the match."""
+    positions, scores = search(index, query, limit)
+    query_terms = parse_query(query)
+    results = index.objects.iloc[positions].reset_index(drop=True)
+    results['Score'] = np.round(scores, 2)
+    results['Match'] = [snippet(index.texts[position], query_terms) for position in positions]
+    return results